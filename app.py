@@ -1,34 +1,327 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 from dotenv import load_dotenv
 import os
+import json
 import requests
 import cohere # Make sure to install the cohere library: pip install cohere
-import numpy as np
-import pandas as pd
 from datetime import datetime
-import io
-import base64
+import math
+import time
+from urllib.parse import quote
 import pytz
-import matplotlib
-matplotlib.use('Agg') # Ensure Matplotlib runs in a headless environment
-import matplotlib.pyplot as plt
+import numpy as np
 import traceback # For detailed error logging
+import threading
+import multiprocessing
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
+from cache import TTLCache
+from sqlite_cache import SQLiteCacheBackend
+from singleflight import SingleFlight, StreamFlight
+from fake_cohere import FakeCohereClient
+from chart_render import parse_days, render_chart_png
+from downsample import lttb
+import indicators
+from compression import choose_encoding, compress
+from coingecko import CoinGeckoClient, SQLiteTokenBucket, COINGECKO_BASE_URL as COINGECKO_DEFAULT_BASE_URL
+from history_store import PriceHistoryStore, DAY_MS
+from prefetch import PrefetchScheduler
+from live_prices import LivePriceHub, LivePricesFull
+from budget import start_deadline, deadline_at, remaining_timeout, LoadTracker
+from metrics import (Registry, Counter, Histogram, CallbackMetric, stage, start_request_timer,
+                     current_timer, submit_with_context)
 
 # Load .env variables
 load_dotenv()
 COHERE_API_KEY = os.getenv('COHERE_API_KEY')
-if not COHERE_API_KEY:
+# Set USE_FAKE_AI=true to run against the offline FakeCohereClient (tests/benchmarks)
+USE_FAKE_AI = os.getenv('USE_FAKE_AI', 'false').lower() == 'true'
+if not COHERE_API_KEY and not USE_FAKE_AI:
     print("Warning: COHERE_API_KEY not found in .env file. AI features will be disabled.")
 
+# --- Metrics ---
+metrics_registry = Registry()
+REQUEST_SECONDS = metrics_registry.register(Histogram(
+    'http_request_duration_seconds', 'Request latency by endpoint.', ('endpoint', 'status')))
+STAGE_SECONDS = metrics_registry.register(Histogram(
+    'stage_duration_seconds', 'Latency of individual request stages.', ('stage',)))
+UPSTREAM_REQUESTS = metrics_registry.register(Counter(
+    'upstream_requests_total', 'Upstream API calls by service and status (HTTP code, ok or error).', ('service', 'status')))
+
+DEGRADED_PARTS = metrics_registry.register(Counter(
+    'degraded_response_parts_total', 'Response parts skipped, deferred or served stale to stay within budget.',
+    ('part', 'mode', 'reason')))
+
+def timed_stage(name):
+    """Times a block as a request stage (Server-Timing header + stage_duration_seconds)."""
+    return stage(name, STAGE_SECONDS)
+
+# Cache backend shared by all worker processes on the host ('sqlite'), or none ('memory')
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'sqlite').lower()
+CACHE_SQLITE_PATH = os.getenv('CACHE_SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cache.sqlite3'))
+CACHE_SQLITE_MAX_MB = float(os.getenv('CACHE_SQLITE_MAX_MB', '256'))
+
+cache_backend = None
+if CACHE_BACKEND == 'sqlite':
+    cache_backend = SQLiteCacheBackend(CACHE_SQLITE_PATH, max_bytes=int(CACHE_SQLITE_MAX_MB * 1024 * 1024))
+elif CACHE_BACKEND != 'memory':
+    print(f"Unknown CACHE_BACKEND '{CACHE_BACKEND}', caching in memory only.")
+
+# Shared CoinGecko client: pooled connections, retries and a client-side rate budget
+COINGECKO_API_KEY = os.getenv('COINGECKO_API_KEY')
+COINGECKO_BASE_URL = os.getenv('COINGECKO_BASE_URL', COINGECKO_DEFAULT_BASE_URL)
+COINGECKO_RATE_PER_MINUTE = int(os.getenv('COINGECKO_RATE_PER_MINUTE', '30'))
+COINGECKO_MAX_RETRIES = int(os.getenv('COINGECKO_MAX_RETRIES', '3'))
+
+# COINGECKO_RATE_PER_MINUTE is the budget of the whole host: with the sqlite backend all
+# workers draw from one bucket in the same database; otherwise each process gets the full rate
+coingecko_bucket = None
+if cache_backend is not None:
+    coingecko_bucket = SQLiteTokenBucket(CACHE_SQLITE_PATH, COINGECKO_RATE_PER_MINUTE)
+
+coingecko = CoinGeckoClient(
+    base_url=COINGECKO_BASE_URL,
+    api_key=COINGECKO_API_KEY,
+    rate_per_minute=COINGECKO_RATE_PER_MINUTE,
+    max_retries=COINGECKO_MAX_RETRIES,
+    observer=lambda status: UPSTREAM_REQUESTS.inc(service='coingecko', status=status),
+    bucket=coingecko_bucket
+)
+
+# CoinGecko coin payload cache (seconds / number of entries)
+COIN_CACHE_TTL = int(os.getenv('COIN_CACHE_TTL', '60'))
+COIN_CACHE_STALE_TTL = int(os.getenv('COIN_CACHE_STALE_TTL', '240'))
+COIN_CACHE_SIZE = int(os.getenv('COIN_CACHE_SIZE', '512'))
+
+coin_cache = TTLCache(maxsize=COIN_CACHE_SIZE, ttl=COIN_CACHE_TTL, stale_ttl=COIN_CACHE_STALE_TTL,
+                      backend=cache_backend, namespace='coin')
+
+# Local price history store for long chart ranges (daily points, memory-mapped)
+HISTORY_DIR = os.getenv('HISTORY_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'history'))
+HISTORY_REFRESH_SECONDS = int(os.getenv('HISTORY_REFRESH_SECONDS', '300'))
+HISTORY_RANGES = ('365', 'max')
+
+history_store = PriceHistoryStore(HISTORY_DIR, fetch=lambda coin_id, days: fetch_daily_market_chart(coin_id, days),
+                                  refresh_interval=HISTORY_REFRESH_SECONDS)
+
+# Batch /coins/markets lookups: ids per upstream call and per request
+BATCH_PAGE_SIZE = int(os.getenv('BATCH_PAGE_SIZE', '250'))
+BATCH_MAX_IDS = int(os.getenv('BATCH_MAX_IDS', '1000'))
+
+markets_cache = TTLCache(maxsize=COIN_CACHE_SIZE, ttl=COIN_CACHE_TTL, stale_ttl=COIN_CACHE_STALE_TTL,
+                         backend=cache_backend, namespace='markets')
+
+# Price change periods shown in the changes table and returned by the batch API
+CHANGE_PERIODS = ('1h', '24h', '7d', '14d', '30d', '1y')
+
+# Background prefetch of the most requested coins
+PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', 'true').lower() == 'true'
+PREFETCH_TOP_N = int(os.getenv('PREFETCH_TOP_N', '10'))
+PREFETCH_INTERVAL = float(os.getenv('PREFETCH_INTERVAL', '15'))
+PREFETCH_MARGIN = float(os.getenv('PREFETCH_MARGIN', '10'))
+PREFETCH_RESERVE_TOKENS = float(os.getenv('PREFETCH_RESERVE_TOKENS', '2'))
+PREFETCH_AI = os.getenv('PREFETCH_AI', 'false').lower() == 'true'
+PREFETCH_SEED_IDS = tuple(i.strip().lower() for i in os.getenv('PREFETCH_SEED_IDS', '').split(',') if i.strip())
+
+# Live price push: every watched coin is polled in one batched call per LIVE_POLL_INTERVAL;
+# a coin is dropped LIVE_IDLE_TIMEOUT seconds after its last subscriber leaves
+LIVE_POLL_INTERVAL = float(os.getenv('LIVE_POLL_INTERVAL', '20'))
+LIVE_IDLE_TIMEOUT = float(os.getenv('LIVE_IDLE_TIMEOUT', '30'))
+LIVE_MAX_COINS = int(os.getenv('LIVE_MAX_COINS', '20'))
+LIVE_HEARTBEAT = float(os.getenv('LIVE_HEARTBEAT', '15'))
+
+# Chart ranges offered in the dashboard dropdown
+CHART_RANGES = ('1', '7', '30', '90', '365', 'max')
+
+# Concurrent request stages and their timeouts in seconds. AI summaries get their own
+# pool so slow Cohere calls never queue charts and price series loads behind them.
+STAGE_WORKERS = int(os.getenv('STAGE_WORKERS', '8'))
+AI_STAGE_WORKERS = int(os.getenv('AI_STAGE_WORKERS', '8'))
+AI_STAGE_TIMEOUT = float(os.getenv('AI_STAGE_TIMEOUT', '60'))
+CHART_STAGE_TIMEOUT = float(os.getenv('CHART_STAGE_TIMEOUT', '20'))
+# Longest a caller waits on a fetch or chart build another caller already started
+# (shortened to the request deadline), so joiners never outlive their own budget
+SHARED_LOAD_WAIT = float(os.getenv('SHARED_LOAD_WAIT', '30'))
+
+# End-to-end request deadline in seconds (0 disables) and load shedding thresholds. Past the
+# deadline or a threshold, /api/crypto defers the AI summary and serves cached charts.
+REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', '12'))
+OVERLOAD_MAX_IN_FLIGHT = int(os.getenv('OVERLOAD_MAX_IN_FLIGHT', '32'))
+OVERLOAD_MAX_QUEUE_DEPTH = int(os.getenv('OVERLOAD_MAX_QUEUE_DEPTH', str(STAGE_WORKERS)))
+DEADLINE_ENDPOINTS = {'crypto_api', 'crypto_chart_api', 'crypto_chart_data_api', 'crypto_batch_api', 'crypto_analytics_api'}
+# Long-lived streams and probes don't count as load
+LOAD_EXEMPT_ENDPOINTS = {None, 'static', 'ping', 'metrics', 'crypto_summary_stream', 'crypto_live_stream'}
+
+load_tracker = LoadTracker(max_in_flight=OVERLOAD_MAX_IN_FLIGHT, max_queue_depth=OVERLOAD_MAX_QUEUE_DEPTH)
+
+# AI summary cache: summaries are reused while price/24h change stay in the same bucket
+AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', '1800'))
+AI_CACHE_SIZE = int(os.getenv('AI_CACHE_SIZE', '256'))
+AI_PRICE_BUCKET_PCT = float(os.getenv('AI_PRICE_BUCKET_PCT', '2'))
+AI_CHANGE_BUCKET_PCT = float(os.getenv('AI_CHANGE_BUCKET_PCT', '2'))
+
+summary_cache = TTLCache(maxsize=AI_CACHE_SIZE, ttl=AI_CACHE_TTL, backend=cache_backend, namespace='ai_summary')
+
+stage_executor = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix='stage')
+ai_stage_executor = ThreadPoolExecutor(max_workers=AI_STAGE_WORKERS, thread_name_prefix='ai-stage')
+
+# Rendered chart cache; short ranges change quickly, long ranges barely move
+CHART_CACHE_SIZE = int(os.getenv('CHART_CACHE_SIZE', '256'))
+CHART_CACHE_DEFAULT_TTL = 600
+CHART_CACHE_TTLS = {
+    '1': 120,
+    '7': 600,
+    '30': 1800,
+    '90': 3600,
+    '365': 6 * 3600,
+    'max': 12 * 3600,
+}
+
+chart_cache = TTLCache(maxsize=CHART_CACHE_SIZE, ttl=CHART_CACHE_DEFAULT_TTL,
+                       backend=cache_backend, namespace='chart')
+market_chart_cache = TTLCache(maxsize=CHART_CACHE_SIZE, ttl=CHART_CACHE_DEFAULT_TTL,
+                              backend=cache_backend, namespace='market_chart')
+
+# Downsampled chart series API (number of points returned)
+CHART_SERIES_DEFAULT_POINTS = int(os.getenv('CHART_SERIES_DEFAULT_POINTS', '500'))
+CHART_SERIES_MAX_POINTS = int(os.getenv('CHART_SERIES_MAX_POINTS', '5000'))
+
+# Technical indicator analytics API
+ANALYTICS_MAX_IDS = int(os.getenv('ANALYTICS_MAX_IDS', '25'))
+ANALYTICS_MAX_WINDOW = 1000
+ANALYTICS_INDICATORS = ('returns', 'sma', 'ema', 'rsi', 'bollinger', 'volatility', 'drawdown', 'volume_sma')
+ANALYTICS_DEFAULTS = {
+    'sma_windows': [20, 50],
+    'ema_spans': [12, 26],
+    'rsi_period': 14,
+    'bollinger_window': 20,
+    'bollinger_k': 2.0,
+    'volatility_window': 30,
+    'volume_window': 20,
+}
+
+# Response compression (gzip, or brotli when installed) for bodies of at least COMPRESS_MIN_SIZE bytes
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '5'))
+COMPRESS_MIMETYPES = ('application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript')
+
+# Chart rendering process pool (0 renders in the request thread) and its queue bound
+CHART_RENDER_PROCESSES = int(os.getenv('CHART_RENDER_PROCESSES', str(min(4, os.cpu_count() or 1))))
+CHART_RENDER_QUEUE_DEPTH = int(os.getenv('CHART_RENDER_QUEUE_DEPTH', '16'))
+CHART_RENDER_QUEUE_WAIT = float(os.getenv('CHART_RENDER_QUEUE_WAIT', '2'))
+
+chart_executor = None
+chart_executor_lock = threading.Lock()
+chart_queue_slots = threading.BoundedSemaphore(CHART_RENDER_QUEUE_DEPTH)
+
+# Coalesces identical concurrent AI generations and chart builds
+ai_flight = SingleFlight()
+ai_stream_flight = StreamFlight()
+chart_flight = SingleFlight()
+
+class ChartQueueFull(Exception):
+    """Raised when the chart rendering queue has no free slot."""
+
+def metric_caches():
+    return {
+        'coin': coin_cache, 'markets': markets_cache, 'market_chart': market_chart_cache,
+        'chart': chart_cache, 'ai_summary': summary_cache
+    }
+
+def cache_lookup_samples():
+    for name, cache in metric_caches().items():
+        yield (name, 'hit'), cache.hits
+        yield (name, 'stale'), cache.stale_hits
+        yield (name, 'miss'), cache.misses
+
+def cache_hit_ratio_samples():
+    for name, cache in metric_caches().items():
+        total = cache.hits + cache.stale_hits + cache.misses
+        yield (name,), ((cache.hits + cache.stale_hits) / total if total else 0.0)
+
+metrics_registry.register(CallbackMetric(
+    'cache_lookups_total', 'Cache lookups by cache and result.', ('cache', 'result'),
+    cache_lookup_samples, metric_type='counter'))
+metrics_registry.register(CallbackMetric(
+    'cache_hit_ratio', 'Share of cache lookups served from cache (fresh or stale).', ('cache',),
+    cache_hit_ratio_samples))
+metrics_registry.register(CallbackMetric(
+    'cache_backend_hits_total', 'Lookups answered from the shared cache backend after a local miss.', ('cache',),
+    lambda: [((name,), cache.backend_hits) for name, cache in metric_caches().items()], metric_type='counter'))
+metrics_registry.register(CallbackMetric(
+    'cache_entries', 'Entries currently held per cache.', ('cache',),
+    lambda: [((name,), len(cache)) for name, cache in metric_caches().items()]))
+
+metrics_registry.register(CallbackMetric(
+    'requests_in_flight', 'Requests currently being handled (excluding streams).', (),
+    lambda: [((), load_tracker.in_flight)]))
+metrics_registry.register(CallbackMetric(
+    'stage_queue_depth', 'Request stages (AI summary, chart) waiting for a stage worker.', (),
+    lambda: [((), load_tracker.queue_depth)]))
+metrics_registry.register(CallbackMetric(
+    'live_price_coins', 'Coins watched by the live price poller.', (),
+    lambda: [((), len(live_prices.stats()))]))
+metrics_registry.register(CallbackMetric(
+    'live_price_subscribers', 'Connected live price subscribers.', (),
+    lambda: [((), sum(live_prices.stats().values()))]))
+
 app = Flask(__name__)
 
+@app.before_request
+def start_timing():
+    start_request_timer()
+    # Always (re)set: worker threads are reused across requests
+    start_deadline(REQUEST_DEADLINE if REQUEST_DEADLINE > 0 and request.endpoint in DEADLINE_ENDPOINTS else None)
+    if request.endpoint not in LOAD_EXEMPT_ENDPOINTS:
+        load_tracker.request_started()
+
+@app.teardown_request
+def finish_load_tracking(exc):
+    if request.endpoint not in LOAD_EXEMPT_ENDPOINTS:
+        load_tracker.request_finished()
+
+@app.after_request
+def finish_timing(response):
+    timer = current_timer()
+    if timer is not None:
+        response.headers['Server-Timing'] = timer.server_timing()
+        REQUEST_SECONDS.observe(time.perf_counter() - timer.started,
+                                endpoint=request.endpoint or 'unknown', status=response.status_code)
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compresses buffered text responses for clients that accept gzip/br."""
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None or (response.content_length or 0) < COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(compress(response.get_data(), encoding,
+                               gzip_level=COMPRESS_GZIP_LEVEL, brotli_quality=COMPRESS_BROTLI_QUALITY))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        # Each coding is a different representation, so it needs its own strong validator
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
 # Simple health check route
 @app.route('/ping')
 def ping():
     """Health check endpoint used by monitoring tools."""
     return jsonify({'status': 'ok'})
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics: request/stage latency, upstream calls and cache hit ratios."""
+    return Response(metrics_registry.exposition(), mimetype='text/plain; version=0.0.4')
+
 # --- Helper Functions ---
 def fmt_num(val, decimals=0, is_currency=False):
     """Formats a number, optionally as currency with rounding. Returns 'N/A' on error."""
@@ -71,15 +364,67 @@ def get_trend_color_and_arrow(change_percentage_str):
         trend_direction = "neutral"
     return color, arrow, trend_direction
 
+def fetch_coin_data(coin_id, community_data=False, developer_data=False, timeout=15, refresh=False):
+    """Returns the CoinGecko /coins/{id} payload, served from coin_cache when possible.
+
+    Entries are keyed per field set; a cached payload that includes community and
+    developer data also satisfies requests that don't need them. refresh=True
+    bypasses the cache and replaces the entry.
+    Raises requests exceptions on upstream failures.
+    """
+    key = (coin_id, community_data, developer_data)
+    full_key = (coin_id, True, True)
+    if key != full_key and not refresh:
+        data, state = coin_cache.get(full_key)
+        if state == 'fresh':
+            return data
+
+    def load():
+        cg_params = {
+            'localization': 'false', 'tickers': 'false', 'market_data': 'true',
+            'community_data': str(community_data).lower(),
+            'developer_data': str(developer_data).lower(), 'sparkline': 'false'
+        }
+        with timed_stage('coingecko_coin'):
+            return coingecko.get(f"coins/{coin_id}", params=cg_params, timeout=timeout, deadline=deadline_at())
+
+    if refresh:
+        return coin_cache.reload(key, load, timeout=remaining_timeout(SHARED_LOAD_WAIT))
+    return coin_cache.get_or_load(key, load, timeout=remaining_timeout(SHARED_LOAD_WAIT))
+
+def fetch_markets(coin_ids, timeout=15, refresh=False):
+    """Returns /coins/markets rows for coin_ids, keyed by coin id.
+
+    Ids are requested in pages of BATCH_PAGE_SIZE, one upstream call per page;
+    each page is cached on its own. Unknown ids are simply absent from the result.
+    refresh=True bypasses the cache and replaces the entries.
+    """
+    rows = {}
+    for start in range(0, len(coin_ids), BATCH_PAGE_SIZE):
+        page_ids = tuple(sorted(coin_ids[start:start + BATCH_PAGE_SIZE]))
+
+        def load(page_ids=page_ids):
+            params = {
+                'vs_currency': 'usd', 'ids': ','.join(page_ids), 'order': 'market_cap_desc',
+                'per_page': len(page_ids), 'page': 1, 'sparkline': 'false',
+                'price_change_percentage': ','.join(CHANGE_PERIODS)
+            }
+            with timed_stage('coingecko_markets'):
+                return coingecko.get("coins/markets", params=params, timeout=timeout, deadline=deadline_at())
+
+        if refresh:
+            page_rows = markets_cache.reload(page_ids, load, timeout=remaining_timeout(SHARED_LOAD_WAIT))
+        else:
+            page_rows = markets_cache.get_or_load(page_ids, load, timeout=remaining_timeout(SHARED_LOAD_WAIT))
+        for row in page_rows:
+            rows[row.get('id')] = row
+    return rows
+
 def build_changes_table(mkt_data):
     """Builds an HTML table for price changes over various periods."""
     periods = {
-        '1h': mkt_data.get('price_change_percentage_1h_in_currency', {}).get('usd'),
-        '24h': mkt_data.get('price_change_percentage_24h_in_currency', {}).get('usd'),
-        '7d': mkt_data.get('price_change_percentage_7d_in_currency', {}).get('usd'),
-        '14d': mkt_data.get('price_change_percentage_14d_in_currency', {}).get('usd'), # This might not directly map to dropdown, but is good info
-        '30d': mkt_data.get('price_change_percentage_30d_in_currency', {}).get('usd'),
-        '1y': mkt_data.get('price_change_percentage_1y_in_currency', {}).get('usd')
+        period: mkt_data.get(f'price_change_percentage_{period}_in_currency', {}).get('usd')
+        for period in CHANGE_PERIODS
     }
 
     headers_html = "".join(f"<th>{period.upper()}</th>" for period in periods)
@@ -102,131 +447,639 @@ def build_changes_table(mkt_data):
         </table>
     """
 
+def fetch_market_chart(coin_id, days_for_api, timeout=15, refresh=False):
+    """Returns the CoinGecko market_chart payload (prices, market_caps, total_volumes).
+
+    Cached per (coin_id, days) with the same range-dependent TTLs as rendered charts;
+    refresh=True bypasses the cache and replaces the entry.
+    Raises requests exceptions on upstream failures.
+    """
+    def load():
+        chart_params = {'vs_currency': 'usd', 'days': days_for_api} 
+        with timed_stage('coingecko_market_chart'):
+            return coingecko.get(f"coins/{coin_id}/market_chart", params=chart_params, timeout=timeout, deadline=deadline_at())
+
+    ttl = CHART_CACHE_TTLS.get(days_for_api, CHART_CACHE_DEFAULT_TTL)
+    if refresh:
+        return market_chart_cache.reload((coin_id, days_for_api), load, ttl=ttl, timeout=remaining_timeout(SHARED_LOAD_WAIT))
+    return market_chart_cache.get_or_load((coin_id, days_for_api), load, ttl=ttl, timeout=remaining_timeout(SHARED_LOAD_WAIT))
+
+def fetch_daily_market_chart(coin_id, days):
+    """market_chart at daily interval, as used to fill the local price history store."""
+    params = {'vs_currency': 'usd', 'days': days, 'interval': 'daily'}
+    with timed_stage('coingecko_history'):
+        return coingecko.get(f"coins/{coin_id}/market_chart", params=params, timeout=30, deadline=deadline_at())
+
+def load_price_series(coin_id, days_for_api):
+    """Returns (series, provisional) for a chart range.
+
+    series holds 'timestamps', 'prices', 'market_caps' and 'total_volumes' arrays;
+    provisional is today's not yet stored point as {column: value}, or None.
+    Long ranges (HISTORY_RANGES) are read from the local history store, which only
+    downloads the tail since its last stored day; shorter ranges use market_chart.
+    Raises requests exceptions on upstream failures.
+    """
+    if days_for_api in HISTORY_RANGES:
+        try:
+            history_store.update(coin_id, timeout=remaining_timeout(SHARED_LOAD_WAIT))
+        except (requests.exceptions.RequestException, FuturesTimeoutError) as e:
+            # Serve what we already have; only fail when there is no local history at all
+            if not len(history_store.read(coin_id)['timestamps']):
+                raise
+            print(f"Price history refresh failed for {coin_id}, serving stored data: {e!r}")
+        since_ms = None
+        if days_for_api != 'max':
+            since_ms = int(time.time() * 1000) - int(days_for_api) * DAY_MS
+        return history_store.series(coin_id, since_ms)
+
+    chart_data = fetch_market_chart(coin_id, days_for_api)
+    series = {}
+    for column in ('prices', 'market_caps', 'total_volumes'):
+        values = np.asarray(chart_data.get(column) or [], dtype=np.float64).reshape(-1, 2)
+        series[column] = values[:, 1]
+        if column == 'prices':
+            series['timestamps'] = values[:, 0].astype(np.int64)
+    return series, None
+
+def with_provisional(series, provisional, columns):
+    """The given columns of a load_price_series() result, with the provisional point appended (copies only then)."""
+    if provisional is None:
+        return {column: series[column] for column in columns}
+    return {column: np.append(series[column], provisional[column]) for column in columns}
+
+def chart_render_executor():
+    """Returns the shared chart rendering process pool, or None to render in-thread."""
+    global chart_executor
+    if chart_executor is None and CHART_RENDER_PROCESSES > 0:
+        with chart_executor_lock:
+            if chart_executor is None:
+                # Never fork: this process already runs prefetch, live price and stage threads
+                start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                chart_executor = ProcessPoolExecutor(max_workers=CHART_RENDER_PROCESSES,
+                                                     mp_context=multiprocessing.get_context(start_method))
+    return chart_executor
+
+def reset_chart_executor(broken):
+    """Drops a broken render pool (e.g. a worker was OOM-killed) so the next chart starts a fresh one."""
+    global chart_executor
+    with chart_executor_lock:
+        if chart_executor is not broken:
+            return
+        chart_executor = None
+    print("Chart render pool broke, starting a new one")
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def render_chart(prices_data, coin_name, days_str, overall_trend_color):
+    """Renders a chart on the process pool, bounded to CHART_RENDER_QUEUE_DEPTH queued jobs.
+
+    Raises ChartQueueFull if no slot frees up within CHART_RENDER_QUEUE_WAIT seconds, and
+    concurrent.futures.TimeoutError if the render outlasts CHART_STAGE_TIMEOUT. The slot is
+    held until the job actually finishes, even when the caller stops waiting for it.
+    A broken pool is replaced and the render retried once; after that BrokenProcessPool
+    propagates.
+    """
+    for attempt in range(2):
+        executor = chart_render_executor()
+        if executor is None:
+            return render_chart_png(prices_data, coin_name, days_str, overall_trend_color)
+        if not chart_queue_slots.acquire(timeout=remaining_timeout(CHART_RENDER_QUEUE_WAIT)):
+            raise ChartQueueFull()
+        try:
+            future = executor.submit(render_chart_png, prices_data, coin_name, days_str, overall_trend_color)
+        except BrokenProcessPool:
+            chart_queue_slots.release()
+            reset_chart_executor(executor)
+            if attempt:
+                raise
+            continue
+        except BaseException:
+            chart_queue_slots.release()
+            raise
+        future.add_done_callback(lambda _: chart_queue_slots.release())
+        try:
+            return future.result(timeout=remaining_timeout(CHART_STAGE_TIMEOUT))
+        except BrokenProcessPool:
+            reset_chart_executor(executor)
+            if attempt:
+                raise
+
+def cached_chart(coin_id, days_str, overall_trend_color):
+    """Returns (chart_html, state) from chart_cache without building anything; state is None on a miss."""
+    _, days_for_api = parse_days(days_str)
+    return chart_cache.get((coin_id, days_for_api, overall_trend_color))
+
 def build_chart(coin_id, coin_name, days_str, overall_trend_color="#39FF14"):
-    """Generates a base64 encoded price chart image."""
+    """Generates a base64 encoded price chart image, served from chart_cache when possible.
+
+    Concurrent requests for the same chart share a single fetch and render. Stale
+    entries are rebuilt here; only cached_chart() serves them, under load.
+    """
+    _, days_for_api = parse_days(days_str)
+    cache_key = (coin_id, days_for_api, overall_trend_color)
+    cached_html, state = chart_cache.get(cache_key)
+    if state == 'fresh':
+        return cached_html
     try:
-        # Convert days_str from HTML dropdown value to integer for dictionary keys and API
-        # The HTML values are: "1", "7", "30", "90", "365", "max"
-        if days_str == 'max':
-            days_key_for_title = 'max'
-            days_for_api = 'max' 
-        else:
-            days_key_for_title = int(days_str)
-            days_for_api = str(days_key_for_title)
-    except ValueError:
-        days_key_for_title = 7 # Default key if conversion fails
-        days_for_api = "7"   # Default for API
-
-    chart_url = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart"
-    chart_params = {'vs_currency': 'usd', 'days': days_for_api} 
-    
+        return chart_flight.do(cache_key, _build_chart, coin_id, coin_name, days_for_api, overall_trend_color, cache_key,
+                               timeout=remaining_timeout(SHARED_LOAD_WAIT))
+    except FuturesTimeoutError:
+        # Only joiners get here: the build another request started outlasted this one's budget
+        print(f"Chart for {coin_id} did not finish in time")
+        return CHART_TIMEOUT_HTML
+
+def _build_chart(coin_id, coin_name, days_for_api, overall_trend_color, cache_key):
+    cached_html, state = chart_cache.get(cache_key, count=False)
+    if state == 'fresh':
+        return cached_html
+
     try:
-        chart_resp = requests.get(chart_url, params=chart_params, timeout=15)
-        chart_resp.raise_for_status() 
-        prices_data = chart_resp.json().get('prices')
-        if not prices_data:
+        series, provisional = load_price_series(coin_id, days_for_api)
+        n = len(series['prices'])
+        if not n and provisional is None:
             return '<div class="error-msg text-omisoft-warn p-3 text-xs sm:text-sm">No price data available for chart.</div>'
 
-        df = pd.DataFrame(prices_data, columns=['timestamp', 'price'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-
-        plt.style.use('dark_background')
-        fig, ax = plt.subplots(figsize=(7, 3), dpi=130)
-        
-        ax.plot(df['timestamp'], df['price'], color=overall_trend_color, linewidth=1.8)
-        ax.set_facecolor('#191f1d')
-
-        num_ticks = 5 
-        if len(df) > num_ticks:
-            ticks_idx = [int(i) for i in np.linspace(0, len(df) - 1, num_ticks)]
-            ax.set_xticks(df['timestamp'].iloc[ticks_idx])
-            date_format = '%d-%b' 
-            
-            if days_key_for_title == 1: 
-                date_format = '%H:%M'
-            elif isinstance(days_key_for_title, int) and days_key_for_title <= 7: 
-                date_format = '%d %b' 
-            elif days_key_for_title == 'max' or (isinstance(days_key_for_title, int) and days_key_for_title > 90): 
-                 date_format = '%b-%y' 
-            
-            ax.set_xticklabels([d.strftime(date_format) for d in df['timestamp'].iloc[ticks_idx]], rotation=0, ha='center')
-        
-        # Synchronized chart_titles with HTML dropdown labels
-        chart_titles_map = {
-            1: "24h",    # Corresponds to value "1" in HTML
-            7: "7d",     # Corresponds to value "7"
-            30: "1m",    # Corresponds to value "30"
-            90: "3m",    # Corresponds to value "90"
-            365: "1y",   # Corresponds to value "365"
-            "max": "Max" # Corresponds to value "max"
-        }
-        chart_title_display = chart_titles_map.get(days_key_for_title, f"{days_for_api} Days") # Fallback if key not found
-        
-        ax.set_title(f"{coin_name} • {chart_title_display}", color=overall_trend_color, fontsize=12, pad=10)
-
-        ax.tick_params(axis='x', colors='#a7ffce', labelsize=8)
-        ax.tick_params(axis='y', colors='#a7ffce', labelsize=9)
-        for spine_pos in ['top', 'right']: 
-            ax.spines[spine_pos].set_visible(False)
-        for spine_pos in ['bottom', 'left']:
-            ax.spines[spine_pos].set_color(overall_trend_color)
-            ax.spines[spine_pos].set_linewidth(1.2)
-
-        plt.tight_layout(pad=0.5) 
-        img_io = io.BytesIO()
-        plt.savefig(img_io, format='png', bbox_inches='tight', transparent=True)
-        img_io.seek(0)
-        img_base64 = base64.b64encode(img_io.getvalue()).decode()
-        plt.close(fig) 
-        return f'<img src="data:image/png;base64,{img_base64}" class="chart-img-animated rounded-lg border mt-2 mb-1 w-full" alt="{coin_name} Price Chart">'
+        # One copy straight from the stored views, with room for today's point
+        prices_data = np.empty((n + (provisional is not None), 2))
+        prices_data[:n, 0] = series['timestamps']
+        prices_data[:n, 1] = series['prices']
+        if provisional is not None:
+            prices_data[n] = (provisional['timestamps'], provisional['prices'])
+        with timed_stage('chart_render'):
+            img_base64 = render_chart(prices_data, coin_name, days_for_api, overall_trend_color)
+        chart_html = f'<img src="data:image/png;base64,{img_base64}" class="chart-img-animated rounded-lg border mt-2 mb-1 w-full" alt="{coin_name} Price Chart">'
+        ttl = CHART_CACHE_TTLS.get(days_for_api, CHART_CACHE_DEFAULT_TTL)
+        # Kept as stale for one more TTL, so degraded responses can still show it
+        chart_cache.set(cache_key, chart_html, ttl=ttl, stale_ttl=ttl)
+        return chart_html
     
     except requests.exceptions.RequestException as e:
         print(f"Chart API request error: {e}")
         return f'<div class="error-msg text-omisoft-warn p-3 text-xs sm:text-sm">Chart data temporarily unavailable (API Error).</div>'
+    except ChartQueueFull:
+        print(f"Chart render queue full, dropping chart for {coin_id}")
+        return f'<div class="error-msg text-omisoft-warn p-3 text-xs sm:text-sm">Chart renderer busy. Please try again shortly.</div>'
+    except BrokenProcessPool:
+        print(f"Chart render pool broke twice in a row, dropping chart for {coin_id}")
+        return f'<div class="error-msg text-omisoft-warn p-3 text-xs sm:text-sm">Chart renderer busy. Please try again shortly.</div>'
+    except FuturesTimeoutError:
+        print(f"Chart for {coin_id} did not finish in time")
+        return CHART_TIMEOUT_HTML
     except Exception as e:
         print(f"Error building chart: {e}")
         traceback.print_exc()
         return f'<div class="error-msg text-omisoft-warn p-3 text-xs sm:text-sm">Error generating chart.</div>'
 
+# --- AI Summary ---
+AI_SYSTEM_PROMPT = (
+    "You are an expert crypto market analyst providing insights for executive decision-making. "
+    "Your analysis must be in concise, structured business English, avoiding jargon where possible, and without using hashtags or markdown formatting. "
+    "Before providing your analysis, you must first search for the latest news and developments about the requested cryptocurrency using web search tools. "
+    "Your response should include the following sections clearly:\n"
+    "1. Latest News & Developments: Begin by searching for and summarizing the most recent news, announcements, partnerships, or significant events related to this cryptocurrency from the past 30 days. Include specific dates and sources with URLs where possible.\n"
+    "2. Key Facts: A brief overview of the cryptocurrency.\n"
+    "3. Unique Value Proposition: What makes this coin stand out?\n"
+    "4. Recent Market Behavior: Summarize recent price action and trading patterns, incorporating insights from the latest news findings.\n"
+    "5. Bullish Scenario: Potential positive developments and their impact, referencing recent positive news if applicable.\n"
+    "6. Bearish Scenario: Potential risks and negative outlook, including any recent negative developments or concerns.\n"
+    "7. On-chain/Developer Activity (if available): Briefly mention relevant metrics and recent development updates.\n"
+    "8. Community Strength (if significant): Note community engagement and recent community-driven initiatives.\n"
+    "9. Market Sentiment Analysis: Based on recent news and social media trends, assess current market sentiment.\n"
+    "10. Practical Tips: One concise tip for beginners and one for experienced users, informed by current market conditions.\n"
+    "11. Official Website: State the official website.\n\n"
+    "12. AI Investment Perspective: Based on the comprehensive analysis above, provide a balanced investment outlook that synthesizes all the data points, recent news, market conditions, and risk factors. This should include potential entry points, risk management considerations, and timeline perspectives for different investor profiles.\n\n"
+    "SEARCH REQUIREMENTS:\n"
+    "- Always perform a web search for '[CRYPTO_NAME] news latest developments' before beginning your analysis\n"
+    "- Search for recent price movements, partnerships, technical updates, regulatory news, and market sentiment\n"
+    "- Prioritize information from the last 7-30 days\n"
+    "- Cite your sources appropriately when referencing news items\n\n"
+    "IMPORTANT DISCLAIMER (include verbatim at the end of your analysis):\n"
+    "This information should not be considered financial advice. Always conduct your own research and consult with qualified financial professionals before making any investment or financial decisions. Past performance does not guarantee future results, and all investments carry risk of loss."
+)
+
+def build_ai_prompt(data, coin_id):
+    """Builds the user prompt for the AI summary from a CoinGecko coin payload."""
+    mkt = data.get('market_data', {})
+    coin_name = data.get('name', coin_id.title())
+    symbol = data.get('symbol', '').upper()
+    description_en = (data.get('description', {}).get('en', '') or '')[:800]
+    website_url = (data.get('links', {}).get('homepage', [None])[0] or "#")
+    community = data.get('community_data', {})
+    developer = data.get('developer_data', {})
+    return (
+        f"Analyze {coin_name} ({symbol}) as of {datetime.now(pytz.timezone('Europe/Amsterdam')).strftime('%d-%m-%Y %H:%M:%S')}."
+        f"\nCurrent Price: ${fmt_num(mkt.get('current_price', {}).get('usd'),4)}"
+        f"\nMarket Cap: ${fmt_num(mkt.get('market_cap', {}).get('usd'))}"
+        f"\nFDV: ${fmt_num(mkt.get('fully_diluted_valuation', {}).get('usd'))}"
+        f"\n24h Vol: ${fmt_num(mkt.get('total_volume', {}).get('usd'))}"
+        f"\n24h High: ${fmt_num(mkt.get('high_24h', {}).get('usd'),4)} | 24h Low: ${fmt_num(mkt.get('low_24h', {}).get('usd'),4)}"
+        f"\nCirculating Supply: {fmt_num(mkt.get('circulating_supply'))} | Total Supply: {fmt_num(mkt.get('total_supply'))} | Max Supply: {fmt_num(mkt.get('max_supply'))}"
+        f"\nDev stars: {fmt_num(developer.get('stars'))} | Forks: {fmt_num(developer.get('forks'))} | Issues: {fmt_num(developer.get('total_issues'))}"
+        f"\nTwitter followers: {fmt_num(community.get('twitter_followers'))} | Reddit subscribers: {fmt_num(community.get('reddit_subscribers'))}"
+        f"\nDescription: {description_en}\nWebsite: {website_url}\n"
+    )
+
+ai_client = None
+ai_client_lock = threading.Lock()
+
+def get_ai_client():
+    """Returns the shared AI client, or None when AI is disabled.
+
+    Assign a client to app.ai_client (e.g. FakeCohereClient) to stand in for Cohere.
+    """
+    global ai_client
+    if ai_client is None:
+        with ai_client_lock:
+            if ai_client is None:
+                if USE_FAKE_AI:
+                    ai_client = FakeCohereClient()
+                elif COHERE_API_KEY:
+                    ai_client = cohere.Client(COHERE_API_KEY)
+    return ai_client
+
+def ai_chat_kwargs(user_content_for_ai):
+    """Common arguments for co.chat / co.chat_stream."""
+    return {
+        'model': "command-a-03-2025",
+        'message': user_content_for_ai,
+        'chat_history': [{"role": "SYSTEM", "message": AI_SYSTEM_PROMPT}],
+        'max_tokens': 1024,
+        'temperature': 0.1,
+    }
+
+def ai_summary_key(data, coin_id):
+    """Cache key for an AI summary: coin id plus a quantized market snapshot.
+
+    Price is bucketed on a log scale (AI_PRICE_BUCKET_PCT wide), the 24h change in
+    AI_CHANGE_BUCKET_PCT steps, together with the current hour of day.
+    """
+    mkt = data.get('market_data', {})
+    price = mkt.get('current_price', {}).get('usd')
+    change_24h = mkt.get('price_change_percentage_24h_in_currency', {}).get('usd')
+    try:
+        price_bucket = math.floor(math.log(float(price)) / math.log1p(AI_PRICE_BUCKET_PCT / 100))
+    except (TypeError, ValueError):
+        price_bucket = None
+    try:
+        change_bucket = math.floor(float(change_24h) / AI_CHANGE_BUCKET_PCT)
+    except (TypeError, ValueError):
+        change_bucket = None
+    hour = datetime.now(pytz.timezone('Europe/Amsterdam')).hour
+    return (coin_id, price_bucket, change_bucket, hour)
+
+def generate_ai_summary(user_content_for_ai, cache_key=None):
+    """Runs the Cohere chat call for a prompt. Never raises; returns a fallback message instead.
+
+    When cache_key is given, successful summaries are stored in and served from
+    summary_cache, and concurrent calls for the same key share one generation,
+    including a streamed one that is already running.
+    """
+    if cache_key is None:
+        return _generate_ai_summary(user_content_for_ai)
+    cached, state = summary_cache.get(cache_key)
+    if state:
+        return cached
+    if ai_stream_flight.running(cache_key):
+        try:
+            return "".join(stream_ai_summary(user_content_for_ai, cache_key)).strip()
+        except Exception as e:
+            print(f"Shared Cohere stream failed: {e}")
+            return f"AI analysis unavailable due to an error: {str(e)[:100]}"
+    return ai_flight.do(cache_key, _generate_ai_summary, user_content_for_ai, cache_key)
+
+def _generate_ai_summary(user_content_for_ai, cache_key=None):
+    if cache_key is not None:
+        cached, state = summary_cache.get(cache_key, count=False)
+        if state:
+            return cached
+    co = get_ai_client()
+    if co is None:
+        return "AI analysis disabled (API key not configured)."
+    try:
+        with timed_stage('cohere_chat'):
+            chat_response = co.chat(**ai_chat_kwargs(user_content_for_ai))
+        UPSTREAM_REQUESTS.inc(service='cohere', status='ok')
+        summary = chat_response.text.strip()
+        if cache_key is not None and summary:
+            summary_cache.set(cache_key, summary)
+        return summary
+    except Exception as e:
+        UPSTREAM_REQUESTS.inc(service='cohere', status='error')
+        print(f"Cohere API error: {e}")
+        traceback.print_exc()
+        return f"AI analysis unavailable due to an error: {str(e)[:100]}"
+
+def stream_ai_summary(user_content_for_ai, cache_key=None):
+    """Yields the AI summary text chunk by chunk as Cohere generates it.
+
+    A cached summary for cache_key is yielded as a single chunk; a completed stream
+    is stored under cache_key. Concurrent streams for the same cache_key share one
+    Cohere stream: later callers replay its chunks so far and then follow it live.
+    Raises RuntimeError if AI is disabled; upstream errors propagate to every caller.
+    """
+    if cache_key is not None:
+        cached, state = summary_cache.get(cache_key)
+        if state:
+            yield cached
+            return
+    if cache_key is not None and ai_flight.running(cache_key):
+        # A regular generation (e.g. one a degraded /api/crypto stopped waiting for) is running; share it
+        yield ai_flight.do(cache_key, _generate_ai_summary, user_content_for_ai, cache_key)
+        return
+    co = get_ai_client()
+    if co is None:
+        raise RuntimeError("AI analysis disabled (API key not configured).")
+    if cache_key is None:
+        yield from _stream_ai_summary(co, user_content_for_ai)
+        return
+    yield from ai_stream_flight.stream(cache_key, _stream_ai_summary, co, user_content_for_ai, cache_key,
+                                       timeout=AI_STAGE_TIMEOUT)
+
+def _stream_ai_summary(co, user_content_for_ai, cache_key=None):
+    if cache_key is not None:
+        # A stream for this key may have finished while this one was being set up
+        cached, state = summary_cache.get(cache_key, count=False)
+        if state:
+            yield cached
+            return
+    chunks = []
+    try:
+        with timed_stage('cohere_stream'):
+            for event in co.chat_stream(**ai_chat_kwargs(user_content_for_ai)):
+                if event.event_type == "text-generation":
+                    chunks.append(event.text)
+                    yield event.text
+    except Exception:
+        UPSTREAM_REQUESTS.inc(service='cohere', status='error')
+        raise
+    UPSTREAM_REQUESTS.inc(service='cohere', status='ok')
+    summary = "".join(chunks).strip()
+    if cache_key is not None and summary:
+        summary_cache.set(cache_key, summary)
+
+def sse_event(payload, event=None):
+    """Formats a JSON payload as a Server-Sent Events message."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+# --- Degradation ---
+CHART_TIMEOUT_HTML = '<div class="error-msg text-omisoft-warn p-3 text-xs sm:text-sm">Chart generation timed out.</div>'
+CHART_SKIPPED_HTML = '<div class="error-msg text-omisoft-warn p-3 text-xs sm:text-sm">Chart skipped under high load. Please try again shortly.</div>'
+
+def degrade(degraded, part, mode, reason):
+    """Records that part of a response was skipped, deferred or served stale, and why."""
+    degraded[part] = {'mode': mode, 'reason': reason}
+    DEGRADED_PARTS.inc(part=part, mode=mode, reason=reason)
+
+# --- Conditional JSON responses ---
+ETAG_CODING_SUFFIXES = ('', '-gzip', '-br')
+
+def snapshot_etag(*snapshot):
+    """Strong ETag over the JSON-serializable data a response is built from."""
+    encoded = json.dumps(snapshot, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+def matching_etag(etag):
+    """The form of etag (plain or with a coding suffix) named by If-None-Match, or None.
+
+    The suffix of the coding this request would be served in is tried first, so a
+    304 echoes the validator the full response would have carried.
+    """
+    encoding = choose_encoding(request.accept_encodings)
+    suffixes = sorted(ETAG_CODING_SUFFIXES, key=lambda suffix: suffix != f'-{encoding}')
+    for suffix in suffixes:
+        # If-None-Match always uses the weak comparison
+        if request.if_none_match.contains_weak(etag + suffix):
+            return etag + suffix
+    return None
+
+def not_modified(etag, weak=False):
+    response = Response(status=304)
+    response.set_etag(etag, weak)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def conditional_json(payload, etag=None, weak=False):
+    """JSON response with an ETag (strong over the body unless given); 304 if the client has it."""
+    body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    if etag is None:
+        etag = hashlib.sha256(body).hexdigest()[:32]
+    matched = matching_etag(etag)
+    if matched:
+        return not_modified(matched, weak)
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag, weak)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# --- Analytics ---
+def json_array(values):
+    """Array as a JSON-ready list, with NaN/inf as null."""
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if finite.all():
+        return values.tolist()
+    return np.where(finite, values, None).tolist()
+
+def json_float(value):
+    return float(value) if value is not None and math.isfinite(value) else None
+
+def parse_analytics_params(req_data):
+    """Validates indicator parameters from the request. Raises ValueError with a user-facing message."""
+    params = dict(ANALYTICS_DEFAULTS)
+
+    def window(name, value):
+        try:
+            value = int(value)
+        except (ValueError, TypeError):
+            raise ValueError(f'{name} must be an integer.')
+        if not 2 <= value <= ANALYTICS_MAX_WINDOW:
+            raise ValueError(f'{name} must be between 2 and {ANALYTICS_MAX_WINDOW}.')
+        return value
+
+    for name in ('sma_windows', 'ema_spans'):
+        if name in req_data:
+            values = req_data[name]
+            if not isinstance(values, list) or not values or len(values) > 5:
+                raise ValueError(f'{name} must be a list of 1 to 5 integers.')
+            params[name] = list(dict.fromkeys(window(name, v) for v in values))
+    for name in ('rsi_period', 'bollinger_window', 'volatility_window', 'volume_window'):
+        if name in req_data:
+            params[name] = window(name, req_data[name])
+    if 'bollinger_k' in req_data:
+        try:
+            params['bollinger_k'] = float(req_data['bollinger_k'])
+        except (ValueError, TypeError):
+            raise ValueError('bollinger_k must be a number.')
+        if not 0 < params['bollinger_k'] <= 10:
+            raise ValueError('bollinger_k must be between 0 and 10.')
+    return params
+
+def compute_indicators(series, selected, params, points=None):
+    """Computes the selected indicators over the with_provisional() columns of a load_price_series() result.
+
+    Indicators are computed over the full series so windows are warmed up, then
+    every array is cut to the last points entries.
+    """
+    timestamps, prices, volumes = series['timestamps'], series['prices'], series['total_volumes']
+    tail = slice(-points, None) if points else slice(None)
+    result = {
+        'points': len(prices[tail]),
+        'timestamps': timestamps[tail].tolist(),
+        'prices': json_array(prices[tail]),
+    }
+
+    if 'returns' in selected:
+        log_returns = indicators.log_returns(prices)
+        total = prices[-1] / prices[0] - 1 if len(prices) > 1 and prices[0] else None
+        result['returns'] = {
+            'log': json_array(log_returns[tail]),
+            'total': json_float(total),
+            'mean_log': json_float(np.nanmean(log_returns)) if len(prices) > 1 else None,
+        }
+    if 'sma' in selected:
+        result['sma'] = {str(w): json_array(indicators.sma(prices, w)[tail]) for w in params['sma_windows']}
+    if 'ema' in selected:
+        result['ema'] = {str(s): json_array(indicators.ema(prices, s)[tail]) for s in params['ema_spans']}
+    if 'rsi' in selected:
+        result['rsi'] = json_array(indicators.rsi(prices, params['rsi_period'])[tail])
+    if 'bollinger' in selected:
+        middle, upper, lower = indicators.bollinger(prices, params['bollinger_window'], params['bollinger_k'])
+        result['bollinger'] = {
+            'middle': json_array(middle[tail]),
+            'upper': json_array(upper[tail]),
+            'lower': json_array(lower[tail]),
+        }
+    if 'volatility' in selected:
+        rolling, overall = indicators.realized_volatility(prices, timestamps, params['volatility_window'])
+        result['volatility'] = {'rolling': json_array(rolling[tail]), 'annualized': json_float(overall)}
+    if 'drawdown' in selected:
+        drawdowns, max_drawdown, peak, trough = indicators.drawdown(prices)
+        result['drawdown'] = {
+            'series': json_array(drawdowns[tail]),
+            'max': json_float(max_drawdown),
+            'peak_timestamp': int(timestamps[peak]) if peak is not None else None,
+            'trough_timestamp': int(timestamps[trough]) if trough is not None else None,
+        }
+    if 'volume_sma' in selected:
+        result['volume_sma'] = json_array(indicators.sma(volumes, params['volume_window'])[tail])
+    return result
+
+# --- Background Prefetch ---
+def prefetch_due(cache, key):
+    """True when a cache entry is missing or expires within the next prefetch cycle."""
+    remaining = cache.ttl_remaining(key)
+    return remaining is None or remaining < PREFETCH_INTERVAL + PREFETCH_MARGIN
+
+def prefetch_coin(coin_id):
+    if prefetch_due(coin_cache, (coin_id, True, True)):
+        fetch_coin_data(coin_id, community_data=True, developer_data=True, refresh=True)
+
+def prefetch_chart_range(days_for_api):
+    def prefetch_chart_series(coin_id):
+        if days_for_api in HISTORY_RANGES:
+            history_store.update(coin_id, timeout=remaining_timeout(SHARED_LOAD_WAIT))
+        elif prefetch_due(market_chart_cache, (coin_id, days_for_api)):
+            fetch_market_chart(coin_id, days_for_api, refresh=True)
+    prefetch_chart_series.__name__ = f"prefetch_chart_series_{days_for_api}"
+    return prefetch_chart_series
+
+def prefetch_ai_summary(coin_id):
+    data, state = coin_cache.get((coin_id, True, True), count=False)
+    if state:
+        generate_ai_summary(build_ai_prompt(data, coin_id), ai_summary_key(data, coin_id))
+
+def prefetch_has_budget():
+    """Leaves PREFETCH_RESERVE_TOKENS of the CoinGecko rate budget for user requests."""
+    return coingecko.bucket.available() >= PREFETCH_RESERVE_TOKENS + 1
+
+prefetch_tasks = [prefetch_coin] + [prefetch_chart_range(days) for days in CHART_RANGES]
+if PREFETCH_AI:
+    prefetch_tasks.append(prefetch_ai_summary)
+
+prefetcher = PrefetchScheduler(
+    prefetch_tasks,
+    top_n=PREFETCH_TOP_N,
+    interval=PREFETCH_INTERVAL,
+    seed_ids=PREFETCH_SEED_IDS,
+    has_budget=prefetch_has_budget
+)
+# Chart render workers re-import this module when it is run as a script; only the server prefetches
+if PREFETCH_ENABLED and multiprocessing.parent_process() is None:
+    prefetcher.start()
+
+# --- Live Prices ---
+def fetch_live_prices(coin_ids):
+    """Current price fields for the live feed, keyed by coin id; unknown ids are absent.
+
+    All watched coins share one /coins/markets call per BATCH_PAGE_SIZE ids.
+    """
+    prices = {}
+    for coin_id, row in fetch_markets(coin_ids, timeout=10, refresh=True).items():
+        change_24h = row.get('price_change_percentage_24h_in_currency', row.get('price_change_percentage_24h'))
+        prices[coin_id] = {
+            'price': row.get('current_price'),
+            'change_24h': change_24h,
+            'market_cap': row.get('market_cap'),
+            'volume_24h': row.get('total_volume'),
+            'high_24h': row.get('high_24h'),
+            'low_24h': row.get('low_24h'),
+            'last_updated': row.get('last_updated')
+        }
+    return prices
+
+live_prices = LivePriceHub(
+    fetch_live_prices,
+    interval=LIVE_POLL_INTERVAL,
+    idle_timeout=LIVE_IDLE_TIMEOUT,
+    max_coins=LIVE_MAX_COINS,
+    has_budget=prefetch_has_budget
+)
+
 # --- Flask Routes ---
 @app.route('/')
 def index():
     """Serves the main HTML page."""
     return render_template('index.html')
 
-@app.route('/api/crypto', methods=['POST'])
+@app.route('/api/crypto', methods=['GET', 'POST'])
 def crypto_api():
-    """Fetches comprehensive crypto data and AI summary, returns as structured HTML."""
+    """Fetches comprehensive crypto data and AI summary, returns as structured HTML.
+
+    With format='json' returns raw numbers and a chart data URL instead, for
+    client-side rendering. GET takes the same options as query parameters.
+    Responses carry an ETag (weak for HTML, which includes the render time); a
+    matching If-None-Match gets a 304.
+    """
     try:
-        req_data = request.get_json()
+        req_data = request.get_json() if request.method == 'POST' else request.args
         if not req_data:
             return jsonify({'error': 'Invalid request. JSON payload expected.'}), 400
 
         coin_id = req_data.get('id', '').strip().lower()
         days_str = str(req_data.get('days', "7")) 
+        response_format = req_data.get('format', 'html')
 
         if not coin_id:
             return jsonify({'error': 'Cryptocurrency ID is required.'}), 400
+        if response_format not in ('html', 'json'):
+            return jsonify({'error': "format must be 'html' or 'json'."}), 400
 
-        cg_url = f"https://api.coingecko.com/api/v3/coins/{coin_id}"
-        cg_params = {
-            'localization': 'false', 'tickers': 'false', 'market_data': 'true',
-            'community_data': 'true', 'developer_data': 'true', 'sparkline': 'false'
-        }
-        
         try:
-            r = requests.get(cg_url, params=cg_params, timeout=15)
-            r.raise_for_status() 
-            data = r.json()
+            data = fetch_coin_data(coin_id, community_data=True, developer_data=True, timeout=15)
         except requests.exceptions.HTTPError as http_err:
-            if r.status_code == 404:
+            status_code = http_err.response.status_code if http_err.response is not None else 502
+            if status_code == 404:
                  return jsonify({'error': f'No data found for "{coin_id}". Please check the ID.'}), 404
-            return jsonify({'error': f'CoinGecko API error: {http_err}'}), r.status_code
+            return jsonify({'error': f'CoinGecko API error: {http_err}'}), status_code
         except requests.exceptions.RequestException as req_err:
             return jsonify({'error': f'Could not connect to CoinGecko API: {req_err}'}), 503
+        except FuturesTimeoutError:
+            return jsonify({'error': f'Timed out waiting for CoinGecko data for "{coin_id}".'}), 504
 
         if 'market_data' not in data:
             return jsonify({'error': f'Incomplete data received for "{coin_id}". Market data missing.'}), 500
+        # Only ids that resolved to a coin count towards the prefetch top-N
+        prefetcher.record(coin_id)
 
         mkt = data['market_data']
 
@@ -241,14 +1094,11 @@ def crypto_api():
         logo_url = data.get('image', {}).get('large', 'https://placehold.co/64x64/2a2f32/39FF14?text=N/A')
         coin_name = data.get('name', coin_id.title()) 
         symbol = data.get('symbol', '').upper()
-        description_en = (data.get('description', {}).get('en', '') or '')[:800] 
         website_url = (data.get('links', {}).get('homepage', [None])[0] or "#")
 
         twitter_followers = data.get('community_data', {}).get('twitter_followers')
         reddit_subscribers = data.get('community_data', {}).get('reddit_subscribers')
         dev_stars = data.get("developer_data", {}).get("stars")
-        dev_forks = data.get("developer_data", {}).get("forks")
-        dev_total_issues = data.get("developer_data", {}).get("total_issues")
         
         high_24h_usd = mkt.get("high_24h", {}).get("usd")
         low_24h_usd = mkt.get("low_24h", {}).get("usd")
@@ -260,79 +1110,112 @@ def crypto_api():
         trend_color, price_arrow, trend_direction = get_trend_color_and_arrow(price_change_24h_in_currency)
         change_24h_display = f'<span class="text-omisoft-text-faint/80">({fmt_num(price_change_24h_in_currency, 2)}%)</span>'
 
-        ai_summary_text = "AI analysis unavailable." 
-        if COHERE_API_KEY:
+        # With summary='stream' the summary is fetched separately from the SSE endpoint
+        stream_summary = req_data.get('summary') == 'stream'
+
+        # Under load, don't queue slow stages: serve what is cached and defer the rest
+        degraded = {}
+        overload = load_tracker.overload_reason()
+
+        # The AI summary only depends on the coin payload, the chart needs its own
+        # market_chart fetch; run both at once so latency is the slower of the two.
+        chart_future = None
+        chart_html_content = None
+        if response_format == 'html':
+            if overload:
+                chart_html_content, chart_state = cached_chart(coin_id, days_str, trend_color)
+                if chart_state is None:
+                    chart_html_content = CHART_SKIPPED_HTML
+                    degrade(degraded, 'chart', 'skipped', overload)
+                elif chart_state == 'stale':
+                    degrade(degraded, 'chart', 'stale', overload)
+            else:
+                chart_future = submit_with_context(stage_executor, load_tracker.queued(build_chart),
+                                                   coin_id, coin_name, days_str, trend_color)
+
+        ai_summary_text = "Generating AI analysis..."
+        if not stream_summary:
+            ai_cache_key = ai_summary_key(data, coin_id)
+            if overload:
+                cached_summary, summary_state = summary_cache.get(ai_cache_key)
+                if summary_state:
+                    ai_summary_text = cached_summary
+                else:
+                    stream_summary = True
+                    degrade(degraded, 'summary', 'deferred', overload)
+            else:
+                ai_future = submit_with_context(ai_stage_executor, load_tracker.queued(generate_ai_summary),
+                                                build_ai_prompt(data, coin_id), ai_cache_key)
+                try:
+                    ai_summary_text = ai_future.result(timeout=remaining_timeout(AI_STAGE_TIMEOUT))
+                except FuturesTimeoutError:
+                    # The generation keeps running and is picked up by the summary stream
+                    print(f"AI summary for {coin_id} not ready within the request budget, deferring")
+                    stream_summary = True
+                    degrade(degraded, 'summary', 'deferred', 'deadline')
+
+        summary_stream_url = f"/api/crypto/summary/stream?id={quote(coin_id)}" if stream_summary else None
+
+        if response_format == 'json':
+            return conditional_json({
+                'id': coin_id,
+                'name': coin_name,
+                'symbol': symbol,
+                'rank': rank,
+                'image': logo_url,
+                'website': website_url if website_url != "#" else None,
+                'last_updated': mkt.get('last_updated') or data.get('last_updated'),
+                'trend': trend_direction,
+                'market': {
+                    'price': price_usd,
+                    'change_24h': price_change_24h_in_currency,
+                    'market_cap': mcap_usd,
+                    'fdv': fdv_usd,
+                    'volume_24h': volume_usd,
+                    'high_24h': high_24h_usd,
+                    'low_24h': low_24h_usd,
+                    'ath': ath_usd,
+                    'atl': atl_usd,
+                    'circulating_supply': circ_supply,
+                    'total_supply': total_supply,
+                    'max_supply': max_supply
+                },
+                'changes': {
+                    period: mkt.get(f'price_change_percentage_{period}_in_currency', {}).get('usd')
+                    for period in CHANGE_PERIODS
+                },
+                'community': {
+                    'twitter_followers': twitter_followers,
+                    'reddit_subscribers': reddit_subscribers,
+                    'dev_stars': dev_stars
+                },
+                'summary': None if stream_summary else ai_summary_text,
+                'summary_stream_url': summary_stream_url,
+                'chart_url': f"/api/crypto_chart_data?id={quote(coin_id)}&days={quote(days_str)}",
+                'degraded': degraded
+            })
+
+        if chart_future is not None:
             try:
-                co = cohere.Client(COHERE_API_KEY) 
-                
-                user_content_for_ai = (
-                    f"Analyze {coin_name} ({symbol}) as of {datetime.now(pytz.timezone('Europe/Amsterdam')).strftime('%d-%m-%Y %H:%M:%S')}."
-                    f"\nCurrent Price: ${fmt_num(price_usd,4)}"
-                    f"\nMarket Cap: ${fmt_num(mcap_usd)}"
-                    f"\nFDV: ${fmt_num(fdv_usd)}"
-                    f"\n24h Vol: ${fmt_num(volume_usd)}"
-                    f"\n24h High: ${fmt_num(high_24h_usd,4)} | 24h Low: ${fmt_num(low_24h_usd,4)}"
-                    f"\nCirculating Supply: {fmt_num(circ_supply)} | Total Supply: {fmt_num(total_supply)} | Max Supply: {fmt_num(max_supply)}"
-                    f"\nDev stars: {fmt_num(dev_stars)} | Forks: {fmt_num(dev_forks)} | Issues: {fmt_num(dev_total_issues)}"
-                    f"\nTwitter followers: {fmt_num(twitter_followers)} | Reddit subscribers: {fmt_num(reddit_subscribers)}"
-                    f"\nDescription: {description_en}\nWebsite: {website_url}\n"
-                )
-
-                # Finetuned System Message
-                system_prompt = (
-                    "You are an expert crypto market analyst providing insights for executive decision-making. "
-                    "Your analysis must be in concise, structured business English, avoiding jargon where possible, and without using hashtags or markdown formatting. "
-                    "Before providing your analysis, you must first search for the latest news and developments about the requested cryptocurrency using web search tools. "
-                    "Your response should include the following sections clearly:\n"
-                    "1. Latest News & Developments: Begin by searching for and summarizing the most recent news, announcements, partnerships, or significant events related to this cryptocurrency from the past 30 days. Include specific dates and sources with URLs where possible.\n"
-                    "2. Key Facts: A brief overview of the cryptocurrency.\n"
-                    "3. Unique Value Proposition: What makes this coin stand out?\n"
-                    "4. Recent Market Behavior: Summarize recent price action and trading patterns, incorporating insights from the latest news findings.\n"
-                    "5. Bullish Scenario: Potential positive developments and their impact, referencing recent positive news if applicable.\n"
-                    "6. Bearish Scenario: Potential risks and negative outlook, including any recent negative developments or concerns.\n"
-                    "7. On-chain/Developer Activity (if available): Briefly mention relevant metrics and recent development updates.\n"
-                    "8. Community Strength (if significant): Note community engagement and recent community-driven initiatives.\n"
-                    "9. Market Sentiment Analysis: Based on recent news and social media trends, assess current market sentiment.\n"
-                    "10. Practical Tips: One concise tip for beginners and one for experienced users, informed by current market conditions.\n"
-                    "11. Official Website: State the official website.\n\n"
-                    "12. AI Investment Perspective: Based on the comprehensive analysis above, provide a balanced investment outlook that synthesizes all the data points, recent news, market conditions, and risk factors. This should include potential entry points, risk management considerations, and timeline perspectives for different investor profiles.\n\n"
-                    "SEARCH REQUIREMENTS:\n"
-                    "- Always perform a web search for '[CRYPTO_NAME] news latest developments' before beginning your analysis\n"
-                    "- Search for recent price movements, partnerships, technical updates, regulatory news, and market sentiment\n"
-                    "- Prioritize information from the last 7-30 days\n"
-                    "- Cite your sources appropriately when referencing news items\n\n"
-                    "IMPORTANT DISCLAIMER (include verbatim at the end of your analysis):\n"
-                    "This information should not be considered financial advice. Always conduct your own research and consult with qualified financial professionals before making any investment or financial decisions. Past performance does not guarantee future results, and all investments carry risk of loss."
-                )
-
-                messages = [
-                    {"role": "SYSTEM", "message": system_prompt},
-                    {"role": "USER", "message": user_content_for_ai} 
-                ]
-                                       
-                chat_response = co.chat(
-                    model="command-a-03-2025", 
-                    message=messages[-1]["message"], 
-                    chat_history=[messages[0]],
-                    max_tokens=1024, 
-                    temperature=0.1
-                )
-                ai_summary_text = chat_response.text.strip()
-
-            except Exception as e:
-                print(f"Cohere API error: {e}")
-                traceback.print_exc()
-                ai_summary_text = f"AI analysis unavailable due to an error: {str(e)[:100]}"
-        else:
-            ai_summary_text = "AI analysis disabled (API key not configured)."
+                chart_html_content = chart_future.result(timeout=remaining_timeout(CHART_STAGE_TIMEOUT))
+            except FuturesTimeoutError:
+                print(f"Chart for {coin_id} not ready within the request budget")
+                chart_html_content = CHART_TIMEOUT_HTML
+                degrade(degraded, 'chart', 'skipped', 'deadline')
 
+        # The HTML only changes when its inputs do; skip building it for clients that have it.
+        # Weak, since the body also carries the render time, which the snapshot leaves out.
+        etag = snapshot_etag('html', days_str, data, ai_summary_text, chart_html_content, summary_stream_url, degraded)
+        matched = matching_etag(etag)
+        if matched:
+            return not_modified(matched, weak=True)
 
-        chart_html_content = build_chart(coin_id, coin_name, days_str, trend_color)
         changes_table_html = build_changes_table(mkt)
         
         now_nl_formatted = datetime.now(pytz.timezone("Europe/Amsterdam")).strftime('%d-%m-%Y %H:%M:%S')
 
-        result_html_structure = f"""
+        with timed_stage('html_render'):
+            result_html_structure = f"""
         <div class="dashboard-output-wrap">
           <div class="hud-row flex flex-col sm:flex-row items-start sm:items-center justify-between gap-2 mb-3 p-2 rounded-md bg-black/20">
             <span class="hud-time text-omisoft-text-faint flex items-center gap-1">
@@ -398,7 +1281,10 @@ def crypto_api():
           <div id="chartSection" class="chart-section">{chart_html_content}</div>
         </div>
         """
-        return jsonify({'html': result_html_structure, 'trend': trend_direction})
+        response_data = {'html': result_html_structure, 'trend': trend_direction, 'degraded': degraded}
+        if stream_summary:
+            response_data['summary_stream_url'] = summary_stream_url
+        return conditional_json(response_data, etag=etag, weak=True)
 
     except Exception as e:
         print("Error in /api/crypto:")
@@ -406,6 +1292,150 @@ def crypto_api():
         return jsonify({'error': f'An unexpected server error occurred: {str(e)}'}), 500
 
 
+@app.route('/api/crypto/summary/stream')
+def crypto_summary_stream():
+    """Streams the AI summary for a coin as Server-Sent Events.
+
+    Emits 'message' events with {"text": chunk}, then a 'done' event. Failures are
+    reported as a 'summary_error' event so the page can show them inline.
+    """
+    coin_id = request.args.get('id', '').strip().lower()
+    if not coin_id:
+        return jsonify({'error': 'Cryptocurrency ID is required.'}), 400
+
+    try:
+        data = fetch_coin_data(coin_id, community_data=True, developer_data=True, timeout=15)
+    except requests.exceptions.HTTPError as http_err:
+        status_code = http_err.response.status_code if http_err.response is not None else 502
+        return jsonify({'error': f'CoinGecko API error: {http_err}'}), status_code
+    except requests.exceptions.RequestException as req_err:
+        return jsonify({'error': f'Could not connect to CoinGecko API: {req_err}'}), 503
+    except FuturesTimeoutError:
+        return jsonify({'error': f'Timed out waiting for CoinGecko data for "{coin_id}".'}), 504
+
+    user_content_for_ai = build_ai_prompt(data, coin_id)
+    cache_key = ai_summary_key(data, coin_id)
+
+    def generate():
+        try:
+            for chunk in stream_ai_summary(user_content_for_ai, cache_key):
+                yield sse_event({'text': chunk})
+            yield sse_event({}, event='done')
+        except Exception as e:
+            print(f"Cohere streaming error: {e}")
+            traceback.print_exc()
+            yield sse_event({'error': f"AI analysis unavailable due to an error: {str(e)[:100]}"}, event='summary_error')
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/api/crypto/live')
+def crypto_live_stream():
+    """Streams live price updates for a coin as Server-Sent Events.
+
+    The first 'message' event carries the full snapshot (price, change_24h,
+    market_cap, volume_24h, high_24h, low_24h, last_updated), later ones only the
+    fields that changed. An unknown coin gets a 'live_error' event. All clients
+    watching any coin share one batched upstream poll.
+    """
+    coin_id = request.args.get('id', '').strip().lower()
+    if not coin_id:
+        return jsonify({'error': 'Cryptocurrency ID is required.'}), 400
+
+    try:
+        subscription = live_prices.subscribe(coin_id)
+    except LivePricesFull as e:
+        return jsonify({'error': str(e)}), 503
+
+    def generate():
+        try:
+            while True:
+                changes = subscription.get(timeout=LIVE_HEARTBEAT)
+                if subscription.closed:
+                    return
+                if not changes:
+                    # Comment line: keeps proxies from timing out and detects gone clients
+                    yield ": keepalive\n\n"
+                    continue
+                if changes.get('error') == 'not_found':
+                    yield sse_event({'error': f'No data found for "{coin_id}".'}, event='live_error')
+                    return
+                yield sse_event(changes)
+        finally:
+            subscription.close()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Also unsubscribe if the client disconnects before the stream is first read
+    response.call_on_close(subscription.close)
+    return response
+
+
+@app.route('/api/crypto/batch', methods=['POST'])
+def crypto_batch_api():
+    """Returns price, market cap, volume and multi-period changes for a list of coins."""
+    try:
+        req_data = request.get_json()
+        if not req_data:
+            return jsonify({'error': 'Invalid request. JSON payload expected.'}), 400
+
+        raw_ids = req_data.get('ids')
+        if not isinstance(raw_ids, list):
+            return jsonify({'error': 'ids must be a list of cryptocurrency IDs.'}), 400
+        coin_ids = list(dict.fromkeys(str(i).strip().lower() for i in raw_ids if str(i).strip()))
+        if not coin_ids:
+            return jsonify({'error': 'At least one cryptocurrency ID is required.'}), 400
+        if len(coin_ids) > BATCH_MAX_IDS:
+            return jsonify({'error': f'Too many IDs (max {BATCH_MAX_IDS}).'}), 400
+
+        try:
+            rows = fetch_markets(coin_ids)
+        except requests.exceptions.HTTPError as http_err:
+            status_code = http_err.response.status_code if http_err.response is not None else 502
+            return jsonify({'error': f'CoinGecko API error: {http_err}'}), status_code
+        except requests.exceptions.RequestException as req_err:
+            return jsonify({'error': f'Could not connect to CoinGecko API: {req_err}'}), 503
+        except FuturesTimeoutError:
+            return jsonify({'error': 'Timed out waiting for CoinGecko market data.'}), 504
+
+        coins = []
+        for coin_id in coin_ids:
+            row = rows.get(coin_id)
+            if row is None:
+                continue
+            coins.append({
+                'id': coin_id,
+                'name': row.get('name'),
+                'symbol': (row.get('symbol') or '').upper(),
+                'image': row.get('image'),
+                'rank': row.get('market_cap_rank'),
+                'price': row.get('current_price'),
+                'market_cap': row.get('market_cap'),
+                'volume': row.get('total_volume'),
+                'changes': {
+                    period: row.get(f'price_change_percentage_{period}_in_currency')
+                    for period in CHANGE_PERIODS
+                }
+            })
+
+        return conditional_json({
+            'coins': coins,
+            'missing': [coin_id for coin_id in coin_ids if coin_id not in rows]
+        })
+
+    except Exception as e:
+        print(f"Error in /api/crypto/batch: {e}")
+        traceback.print_exc()
+        return jsonify({'error': f'An unexpected server error occurred: {str(e)}'}), 500
+
+
 @app.route('/api/crypto_chart', methods=['POST'])
 def crypto_chart_api():
     """Returns ONLY the new chart and changes table for a coin and new days range."""
@@ -420,18 +1450,16 @@ def crypto_chart_api():
         if not coin_id:
             return jsonify({'error': 'Cryptocurrency ID is required.'}), 400
 
-        cg_url = f"https://api.coingecko.com/api/v3/coins/{coin_id}"
-        cg_params = {'localization': 'false', 'tickers': 'false', 'market_data': 'true', 
-                     'community_data': 'false', 'developer_data': 'false', 'sparkline': 'false'}
         try:
-            r = requests.get(cg_url, params=cg_params, timeout=10)
-            r.raise_for_status()
-            data = r.json()
+            data = fetch_coin_data(coin_id, timeout=10)
         except requests.exceptions.RequestException as req_err:
              return jsonify({'error': f'Could not connect to CoinGecko API for chart data: {req_err}'}), 503
+        except FuturesTimeoutError:
+            return jsonify({'error': f'Timed out waiting for CoinGecko data for "{coin_id}".'}), 504
         
         if 'market_data' not in data:
             return jsonify({'error': f'Incomplete market data for "{coin_id}" for chart.'}), 500
+        prefetcher.record(coin_id)
 
         mkt = data['market_data']
         coin_name = data.get('name', coin_id.title())
@@ -456,5 +1484,133 @@ def crypto_chart_api():
         traceback.print_exc()
         return jsonify({'error': f'An unexpected server error occurred while generating chart/table: {str(e)}'}), 500
 
+@app.route('/api/crypto_chart_data', methods=['GET', 'POST'])
+def crypto_chart_data_api():
+    """Returns the market_chart price series downsampled with LTTB for client-side charting."""
+    try:
+        req_data = request.get_json() if request.method == 'POST' else request.args
+        if not req_data:
+            return jsonify({'error': 'Invalid request. JSON payload expected.'}), 400
+
+        coin_id = req_data.get('id', '').strip().lower()
+        days_str = str(req_data.get('days', "7"))
+        if not coin_id:
+            return jsonify({'error': 'Cryptocurrency ID is required.'}), 400
+
+        try:
+            points = int(req_data.get('points', CHART_SERIES_DEFAULT_POINTS))
+        except (ValueError, TypeError):
+            return jsonify({'error': 'points must be an integer.'}), 400
+        points = max(3, min(points, CHART_SERIES_MAX_POINTS))
+
+        _, days_for_api = parse_days(days_str)
+        try:
+            series, provisional = load_price_series(coin_id, days_for_api)
+        except requests.exceptions.RequestException as req_err:
+            return jsonify({'error': f'Could not connect to CoinGecko API for chart data: {req_err}'}), 503
+        except FuturesTimeoutError:
+            return jsonify({'error': f'Timed out loading chart data for "{coin_id}".'}), 504
+
+        # Downsample the stored views; today's provisional point is always kept as the last one
+        timestamps, prices = series['timestamps'], series['prices']
+        idx = lttb(timestamps, prices, points if provisional is None else max(3, points - 1))
+        timestamps, prices = timestamps[idx].tolist(), prices[idx].tolist()
+        if provisional is not None:
+            timestamps.append(int(provisional['timestamps']))
+            prices.append(float(provisional['prices']))
+
+        return conditional_json({
+            'id': coin_id,
+            'days': days_for_api,
+            'original_points': len(series['prices']) + (provisional is not None),
+            'points': len(prices),
+            'timestamps': timestamps,
+            'prices': prices
+        })
+
+    except Exception as e:
+        print(f"Error in /api/crypto_chart_data: {e}")
+        traceback.print_exc()
+        return jsonify({'error': f'An unexpected server error occurred while building chart data: {str(e)}'}), 500
+
+@app.route('/api/crypto/analytics', methods=['POST'])
+def crypto_analytics_api():
+    """Returns technical indicators (SMA/EMA, RSI, Bollinger bands, volatility, drawdown, returns) for one or more coins."""
+    try:
+        req_data = request.get_json()
+        if not req_data:
+            return jsonify({'error': 'Invalid request. JSON payload expected.'}), 400
+
+        raw_ids = req_data.get('ids')
+        if raw_ids is None and req_data.get('id'):
+            raw_ids = [req_data['id']]
+        if not isinstance(raw_ids, list):
+            return jsonify({'error': 'ids must be a list of cryptocurrency IDs.'}), 400
+        coin_ids = list(dict.fromkeys(str(i).strip().lower() for i in raw_ids if str(i).strip()))
+        if not coin_ids:
+            return jsonify({'error': 'At least one cryptocurrency ID is required.'}), 400
+        if len(coin_ids) > ANALYTICS_MAX_IDS:
+            return jsonify({'error': f'Too many IDs (max {ANALYTICS_MAX_IDS}).'}), 400
+
+        selected = req_data.get('indicators', list(ANALYTICS_INDICATORS))
+        if not isinstance(selected, list) or any(name not in ANALYTICS_INDICATORS for name in selected):
+            return jsonify({'error': f'indicators must be a list drawn from: {", ".join(ANALYTICS_INDICATORS)}.'}), 400
+
+        try:
+            params = parse_analytics_params(req_data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        points = req_data.get('points')
+        if points is not None:
+            try:
+                points = max(1, int(points))
+            except (ValueError, TypeError):
+                return jsonify({'error': 'points must be an integer.'}), 400
+
+        _, days_for_api = parse_days(str(req_data.get('days', '365')))
+
+        # Series for all coins are loaded concurrently (cached market_chart / history store)
+        futures = {coin_id: submit_with_context(stage_executor, load_tracker.queued(load_price_series),
+                                                coin_id, days_for_api)
+                   for coin_id in coin_ids}
+        coins, errors = {}, {}
+        for coin_id, future in futures.items():
+            try:
+                series, provisional = future.result(timeout=remaining_timeout(CHART_STAGE_TIMEOUT))
+            except requests.exceptions.HTTPError as http_err:
+                status_code = http_err.response.status_code if http_err.response is not None else 502
+                errors[coin_id] = 'Not found.' if status_code == 404 else f'CoinGecko API error: {http_err}'
+                continue
+            except FuturesTimeoutError:
+                errors[coin_id] = 'Timed out loading price history.'
+                continue
+            except requests.exceptions.RequestException as req_err:
+                errors[coin_id] = f'Could not load price history: {req_err}'
+                continue
+            series = with_provisional(series, provisional, ('timestamps', 'prices', 'total_volumes'))
+            if not len(series['prices']):
+                errors[coin_id] = 'No price history available.'
+                continue
+            with timed_stage('indicators'):
+                coins[coin_id] = compute_indicators(series, selected, params, points)
+
+        if not coins and errors:
+            return jsonify({'error': 'Could not load price history for any of the requested coins.', 'errors': errors}), 503
+
+        return conditional_json({
+            'days': days_for_api,
+            'indicators': selected,
+            'params': params,
+            'coins': coins,
+            'errors': errors
+        })
+
+    except Exception as e:
+        print(f"Error in /api/crypto/analytics: {e}")
+        traceback.print_exc()
+        return jsonify({'error': f'An unexpected server error occurred while computing analytics: {str(e)}'}), 500
+
+
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=5001, debug=True)
@@ -0,0 +1,142 @@
+"""Load benchmark for /api/crypto, /api/crypto_chart and the AI summary stream against local stand-ins.
+
+Starts the CoinGecko stub, swaps Cohere for FakeCohereClient, serves the app on a
+local port and drives it with concurrent clients. Reports throughput, latency
+percentiles and the number of Cohere calls made; nothing touches the live APIs.
+
+  python -m bench.load --concurrency 16 --requests 400 --endpoint both
+  python -m bench.load --endpoint summary_stream --coins bitcoin --concurrency 10 --requests 10
+"""
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+from bench.stub_servers import start_coingecko_stub, CHART_RANGES
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(coingecko_url, cohere_latency, cohere_token_latency, chart_processes):
+    """Imports app.py configured against the local stand-ins."""
+    os.environ.update({
+        'COINGECKO_BASE_URL': coingecko_url,
+        'COINGECKO_RATE_PER_MINUTE': '1000000',
+        'USE_FAKE_AI': 'true',
+        'PREFETCH_ENABLED': 'false',
+        'CACHE_BACKEND': 'memory',
+        'HISTORY_DIR': tempfile.mkdtemp(prefix='bench-history-'),
+        'CHART_RENDER_PROCESSES': str(chart_processes),
+    })
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    import app as dashboard
+    from fake_cohere import FakeCohereClient
+    dashboard.ai_client = FakeCohereClient(first_token_latency=cohere_latency, token_latency=cohere_token_latency)
+    return dashboard
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+ENDPOINT_PATHS = {
+    'crypto': ['/api/crypto'],
+    'crypto_chart': ['/api/crypto_chart'],
+    'both': ['/api/crypto', '/api/crypto_chart'],
+    'summary_stream': ['/api/crypto/summary/stream'],
+}
+
+
+def build_workload(endpoint, coins, days, total):
+    paths = ENDPOINT_PATHS[endpoint]
+    combos = itertools.cycle((path, coin_id, d) for coin_id, d, path in itertools.product(coins, days, paths))
+    return [next(combos) for _ in range(total)]
+
+
+def run(base_url, workload, concurrency):
+    local = threading.local()
+
+    def one(item):
+        path, coin_id, days = item
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            if path.endswith('/stream'):
+                # Reads the whole event stream; a summary_error event counts as a failure
+                resp = session.get(base_url + path, params={'id': coin_id}, timeout=120)
+                status = 'summary_error' if 'event: summary_error' in resp.text else resp.status_code
+            else:
+                resp = session.post(base_url + path, json={'id': coin_id, 'days': days}, timeout=120)
+                status = resp.status_code
+        except requests.exceptions.RequestException:
+            status = 'error'
+        return path, status, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, workload))
+    return results, time.perf_counter() - started
+
+
+def report(results, elapsed, cohere_calls):
+    print(f"{'endpoint':<20}{'n':>7}{'ok':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    by_path = {}
+    for path, status, latency in results:
+        by_path.setdefault(path, []).append((status, latency))
+    by_path['all'] = [(status, latency) for _, status, latency in results]
+    for path, rows in by_path.items():
+        latencies = np.array([latency for _, latency in rows]) * 1000
+        ok = sum(1 for status, _ in rows if status == 200)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"{path:<20}{len(rows):>7}{ok:>7}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{latencies.max():>10.1f}")
+    statuses = Counter(status for _, status, _ in results)
+    print(f"\n{len(results)} requests in {elapsed:.2f}s -> {len(results) / elapsed:.1f} req/s; statuses: {dict(statuses)}")
+    # Concurrent requests for the same coin should share one generation
+    print(f"Cohere calls: {cohere_calls}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard load benchmark with local CoinGecko/Cohere stand-ins")
+    parser.add_argument('--endpoint', choices=tuple(ENDPOINT_PATHS), default='both')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=0, help="requests sent (and not reported) before measuring")
+    parser.add_argument('--coins', nargs='+', default=['bitcoin', 'ethereum', 'solana', 'cardano'])
+    parser.add_argument('--days', nargs='+', default=list(CHART_RANGES), choices=CHART_RANGES)
+    parser.add_argument('--upstream-latency', type=float, default=0.08, help="CoinGecko stub latency in seconds")
+    parser.add_argument('--cohere-latency', type=float, default=1.5, help="fake Cohere time to first token in seconds")
+    parser.add_argument('--cohere-token-latency', type=float, default=0.0, help="fake Cohere delay per token in seconds")
+    parser.add_argument('--chart-processes', type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    stub, coingecko_url = start_coingecko_stub(latency=args.upstream_latency)
+    dashboard = load_app(coingecko_url, args.cohere_latency, args.cohere_token_latency, args.chart_processes)
+    server = make_server('127.0.0.1', 0, dashboard.app, threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    if args.warmup:
+        run(base_url, build_workload(args.endpoint, args.coins, args.days, args.warmup), args.concurrency)
+    cohere_calls = dashboard.ai_client.calls
+    results, elapsed = run(base_url, build_workload(args.endpoint, args.coins, args.days, args.requests), args.concurrency)
+    report(results, elapsed, dashboard.ai_client.calls - cohere_calls)
+
+    server.shutdown()
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
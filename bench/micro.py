@@ -0,0 +1,78 @@
+"""Microbenchmarks for the dashboard's hot helpers.
+
+  python -m bench.micro
+"""
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+from bench.stub_servers import start_coingecko_stub, synthetic_coin, synthetic_market_chart
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def bench(name, fn, number, repeat=5):
+    times = timeit.repeat(fn, number=number, repeat=repeat)
+    best = min(times) / number
+    mean = sum(times) / (number * repeat)
+    unit, scale = ('ms', 1e3) if best >= 1e-3 else ('us', 1e6)
+    print(f"{name:<40}{best * scale:>12.2f} {unit} best{mean * scale:>12.2f} {unit} mean  (x{number})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard microbenchmarks")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplier for iteration counts")
+    args = parser.parse_args()
+
+    stub, coingecko_url = start_coingecko_stub()
+    os.environ.update({
+        'COINGECKO_BASE_URL': coingecko_url,
+        'COINGECKO_RATE_PER_MINUTE': '1000000',
+        'USE_FAKE_AI': 'true',
+        'PREFETCH_ENABLED': 'false',
+        'CACHE_BACKEND': 'memory',
+        'HISTORY_DIR': tempfile.mkdtemp(prefix='bench-history-'),
+        'CHART_RENDER_PROCESSES': '0',  # measure the render itself, not process-pool overhead
+    })
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    import app as dashboard
+    from chart_render import render_chart_png
+    from downsample import lttb
+
+    n = lambda count: max(1, int(count * args.scale))
+    mkt = synthetic_coin('bitcoin')['market_data']
+    week = synthetic_market_chart('bitcoin', '7')['prices']
+    full = synthetic_market_chart('bitcoin', 'max')['prices']
+    full_arr = np.asarray(full)
+
+    bench("fmt_num(int, currency)", lambda: dashboard.fmt_num(1234567890, 0, is_currency=True), n(20000))
+    bench("fmt_num(float, 4 decimals)", lambda: dashboard.fmt_num(65432.123456, 4), n(20000))
+    bench("fmt_num(str with commas)", lambda: dashboard.fmt_num("1,234,567.5", 2), n(20000))
+    bench("fmt_num(None)", lambda: dashboard.fmt_num(None), n(20000))
+    bench("build_changes_table", lambda: dashboard.build_changes_table(mkt), n(5000))
+    bench("lttb 4000 -> 500 points", lambda: lttb(full_arr[:, 0], full_arr[:, 1], 500), n(200))
+    bench("render_chart_png 7d (168 points)", lambda: render_chart_png(week, "Bitcoin", "7", "#39FF14"), n(5))
+    bench("render_chart_png max (4000 points)", lambda: render_chart_png(full, "Bitcoin", "max", "#39FF14"), n(5))
+
+    def build_chart_cold():
+        dashboard.chart_cache.clear()
+        dashboard.market_chart_cache.clear()
+        return dashboard.build_chart('bitcoin', 'Bitcoin', '30', '#39FF14')
+
+    def build_chart_warm():
+        return dashboard.build_chart('bitcoin', 'Bitcoin', '30', '#39FF14')
+
+    bench("build_chart 30d (cold: fetch + render)", build_chart_cold, n(5))
+    build_chart_warm()
+    bench("build_chart 30d (cached)", build_chart_warm, n(5000))
+
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
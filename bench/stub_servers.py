@@ -0,0 +1,192 @@
+"""Local stand-in for the CoinGecko API used by the benchmarks.
+
+Serves recorded payloads from bench/fixtures when present:
+  fixtures/coins/<id>.json                 -> /coins/<id>
+  fixtures/market_chart/<id>_<days>.json   -> /coins/<id>/market_chart?days=<days>
+and deterministic synthetic payloads otherwise ('max' histories are ~4000 daily
+points, shorter ranges use CoinGecko's 5-minute/hourly granularity). Every
+response is delayed by a configurable upstream latency.
+
+Record real payloads once with:
+  python -m bench.stub_servers --record bitcoin ethereum solana
+"""
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+DAY_MS = 86400000
+CHART_RANGES = ('1', '7', '30', '90', '365', 'max')
+
+
+def _load_fixture(*parts):
+    path = os.path.join(FIXTURES_DIR, *parts)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return None
+
+
+def _seed(coin_id):
+    return sum(ord(ch) for ch in coin_id) % 97 + 1
+
+
+def synthetic_coin(coin_id):
+    base = 10.0 * _seed(coin_id)
+    changes = {p: ((_seed(coin_id) * (i + 3)) % 21 - 10) / 2.0 for i, p in enumerate(('1h', '24h', '7d', '14d', '30d', '1y'))}
+    market_data = {
+        'current_price': {'usd': base}, 'market_cap': {'usd': base * 1e9},
+        'fully_diluted_valuation': {'usd': base * 1.2e9}, 'total_volume': {'usd': base * 5e7},
+        'circulating_supply': 1e9, 'total_supply': 1.2e9, 'max_supply': 2e9,
+        'high_24h': {'usd': base * 1.03}, 'low_24h': {'usd': base * 0.97},
+        'ath': {'usd': base * 3}, 'atl': {'usd': base / 50},
+    }
+    for period, value in changes.items():
+        market_data[f'price_change_percentage_{period}_in_currency'] = {'usd': value}
+    return {
+        'id': coin_id, 'symbol': coin_id[:3], 'name': coin_id.title(), 'market_cap_rank': _seed(coin_id),
+        'image': {'large': 'https://placehold.co/64x64'},
+        'description': {'en': f"{coin_id.title()} is a synthetic coin used for benchmarking. " * 10},
+        'links': {'homepage': [f"https://{coin_id}.example.org"]},
+        'community_data': {'twitter_followers': 123456, 'reddit_subscribers': 65432},
+        'developer_data': {'stars': 4321, 'forks': 1234, 'total_issues': 567},
+        'market_data': market_data,
+    }
+
+
+def synthetic_market_chart(coin_id, days, interval=None):
+    now = int(time.time() * 1000)
+    if days == 'max':
+        n, step = 4000, DAY_MS
+    else:
+        d = max(1, int(days))
+        if interval == 'daily':
+            n, step = d + 1, DAY_MS
+        elif d == 1:
+            n, step = 288, 300000
+        elif d <= 90:
+            n, step = d * 24, 3600000
+        else:
+            n, step = d + 1, DAY_MS
+    start = now // step * step - (n - 1) * step
+    base = 10.0 * _seed(coin_id)
+    prices, caps, volumes = [], [], []
+    for i in range(n):
+        ts = start + i * step
+        price = base * (1.5 + math.sin(i / 40.0) + 0.3 * math.sin(i / 7.0) + i / n)
+        prices.append([ts, price])
+        caps.append([ts, price * 1e9])
+        volumes.append([ts, price * 5e7 * (1 + 0.5 * math.cos(i / 5.0))])
+    prices[-1][0] = caps[-1][0] = volumes[-1][0] = now
+    return {'prices': prices, 'market_caps': caps, 'total_volumes': volumes}
+
+
+def synthetic_markets(ids):
+    rows = []
+    for coin_id in ids:
+        coin = synthetic_coin(coin_id)
+        md = coin['market_data']
+        row = {
+            'id': coin_id, 'symbol': coin['symbol'], 'name': coin['name'], 'image': coin['image']['large'],
+            'current_price': md['current_price']['usd'], 'market_cap': md['market_cap']['usd'],
+            'market_cap_rank': coin['market_cap_rank'], 'total_volume': md['total_volume']['usd'],
+        }
+        for period in ('1h', '24h', '7d', '14d', '30d', '1y'):
+            row[f'price_change_percentage_{period}_in_currency'] = md[f'price_change_percentage_{period}_in_currency']['usd']
+        rows.append(row)
+    return rows
+
+
+class CoinGeckoStubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        parts = [p for p in url.path.split('/') if p]
+        # Accept both /coins/... and /api/v3/coins/...
+        if parts[:2] == ['api', 'v3']:
+            parts = parts[2:]
+
+        if parts == ['coins', 'markets']:
+            ids = [i for i in query.get('ids', '').split(',') if i]
+            return self._send_json(synthetic_markets(ids))
+        if len(parts) == 2 and parts[0] == 'coins':
+            coin_id = parts[1]
+            return self._send_json(_load_fixture('coins', f'{coin_id}.json') or synthetic_coin(coin_id))
+        if len(parts) == 3 and parts[0] == 'coins' and parts[2] == 'market_chart':
+            coin_id, days = parts[1], query.get('days', '7')
+            payload = None
+            if query.get('interval') != 'daily':
+                payload = _load_fixture('market_chart', f'{coin_id}_{days}.json')
+            return self._send_json(payload or synthetic_market_chart(coin_id, days, query.get('interval')))
+        return self._send_json({'error': 'not found'}, status=404)
+
+
+def start_coingecko_stub(host='127.0.0.1', port=0, latency=0.0):
+    """Starts the stub in a daemon thread. Returns (server, base_url)."""
+    handler = type('Handler', (CoinGeckoStubHandler,), {'latency': latency})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='coingecko-stub', daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def record_fixtures(coin_ids):
+    """Downloads live /coins/{id} and market_chart payloads into bench/fixtures."""
+    base = 'https://api.coingecko.com/api/v3'
+    os.makedirs(os.path.join(FIXTURES_DIR, 'coins'), exist_ok=True)
+    os.makedirs(os.path.join(FIXTURES_DIR, 'market_chart'), exist_ok=True)
+    session = requests.Session()
+    for coin_id in coin_ids:
+        params = {'localization': 'false', 'tickers': 'false', 'market_data': 'true',
+                  'community_data': 'true', 'developer_data': 'true', 'sparkline': 'false'}
+        resp = session.get(f"{base}/coins/{coin_id}", params=params, timeout=30)
+        resp.raise_for_status()
+        with open(os.path.join(FIXTURES_DIR, 'coins', f'{coin_id}.json'), 'w') as f:
+            json.dump(resp.json(), f)
+        for days in CHART_RANGES:
+            time.sleep(2.5)  # stay inside the free tier's per-minute quota
+            resp = session.get(f"{base}/coins/{coin_id}/market_chart", params={'vs_currency': 'usd', 'days': days}, timeout=30)
+            resp.raise_for_status()
+            with open(os.path.join(FIXTURES_DIR, 'market_chart', f'{coin_id}_{days}.json'), 'w') as f:
+                json.dump(resp.json(), f)
+        print(f"Recorded {coin_id}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local CoinGecko stub server")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument('--record', nargs='+', metavar='COIN_ID', help="record live fixtures instead of serving")
+    args = parser.parse_args()
+    if args.record:
+        record_fixtures(args.record)
+    else:
+        server, url = start_coingecko_stub(port=args.port, latency=args.latency)
+        print(f"CoinGecko stub listening on {url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
@@ -0,0 +1,94 @@
+import contextvars
+import threading
+import time
+
+# --- Per-request deadlines ---
+_current_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+
+class Deadline:
+    """End-to-end time budget of one request, as an absolute time.monotonic() value."""
+
+    def __init__(self, seconds):
+        self.at = time.monotonic() + seconds
+
+    def remaining(self):
+        return self.at - time.monotonic()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, cap):
+        """cap, shortened to the time left (never negative)."""
+        return max(0.0, min(cap, self.remaining()))
+
+
+def start_deadline(seconds):
+    """Sets the deadline for the current request (None for no deadline) and returns it.
+
+    Work submitted with metrics.submit_with_context inherits it.
+    """
+    deadline = Deadline(seconds) if seconds is not None else None
+    _current_deadline.set(deadline)
+    return deadline
+
+
+def current_deadline():
+    return _current_deadline.get()
+
+
+def deadline_at():
+    """The current deadline as a time.monotonic() value, or None."""
+    deadline = _current_deadline.get()
+    return deadline.at if deadline is not None else None
+
+
+def remaining_timeout(cap):
+    """cap, shortened to what is left of the current request's deadline."""
+    deadline = _current_deadline.get()
+    return cap if deadline is None else deadline.timeout(cap)
+
+
+# --- Load tracking ---
+class LoadTracker:
+    """Counts in-flight requests and queued stage tasks to decide when to shed work."""
+
+    def __init__(self, max_in_flight, max_queue_depth):
+        self.max_in_flight = max_in_flight
+        self.max_queue_depth = max_queue_depth
+        self.in_flight = 0
+        self.queue_depth = 0
+        self._lock = threading.Lock()
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def queued(self, fn):
+        """Wraps fn so it counts towards queue_depth from now until it starts running."""
+        with self._lock:
+            self.queue_depth += 1
+
+        def run(*args, **kwargs):
+            with self._lock:
+                self.queue_depth -= 1
+            return fn(*args, **kwargs)
+        return run
+
+    def overload_reason(self):
+        """'in_flight' or 'queue_depth' when a threshold is exceeded, else None.
+
+        Meant to be called by a request that is already counted in in_flight but has
+        not queued its stages yet: up to max_in_flight requests run in full, and its
+        stages are shed once max_queue_depth tasks are already waiting.
+        """
+        with self._lock:
+            if self.in_flight > self.max_in_flight:
+                return 'in_flight'
+            if self.queue_depth >= self.max_queue_depth:
+                return 'queue_depth'
+        return None
@@ -0,0 +1,195 @@
+import threading
+import time
+from collections import OrderedDict
+
+from singleflight import SingleFlight
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a TTL.
+
+    Entries older than their TTL but still inside the stale window are served
+    as-is while a single background refresh replaces them.
+
+    With a backend (see sqlite_cache.CacheBackend) this LRU becomes an L1 in front
+    of a store shared with other processes: writes go through to the backend under
+    namespace, and entries missing or no longer fresh here are looked up there.
+    Backend failures are logged and treated as misses.
+    """
+
+    def __init__(self, maxsize=256, ttl=60, stale_ttl=0, backend=None, namespace=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.backend = backend
+        self.namespace = namespace
+        self._data = OrderedDict()  # key -> (value, expires_at, stale_until)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.backend_hits = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def get(self, key, count=True):
+        """Returns (value, state) where state is 'fresh', 'stale' or None on a miss.
+
+        count=False skips the hit/miss statistics, for re-checks of a lookup already counted.
+        """
+        if self.backend is not None:
+            self._load_from_backend(key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += count
+                return None, None
+            value, expires_at, stale_until = entry
+            if now < expires_at:
+                self._data.move_to_end(key)
+                self.hits += count
+                return value, 'fresh'
+            if now < stale_until:
+                self._data.move_to_end(key)
+                self.stale_hits += count
+                return value, 'stale'
+            del self._data[key]
+            self.misses += count
+            return None, None
+
+    def _load_from_backend(self, key, force=False):
+        """Copies a fresher backend entry into the LRU when the local one is missing or not fresh.
+
+        force=True looks the key up even when the local entry is still fresh.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+        if not force and entry is not None and time.monotonic() < entry[1]:
+            return
+        try:
+            found = self.backend.get(self.namespace, key)
+        except Exception as e:
+            print(f"Cache backend read failed for {self.namespace}/{key}: {e}")
+            return
+        if found is None:
+            return
+        value, expires_wall, stale_wall = found
+        offset = time.monotonic() - time.time()
+        expires_at = expires_wall + offset
+        with self._lock:
+            current = self._data.get(key)
+            if current is None or current[1] < expires_at:
+                self._store(key, value, expires_at, stale_wall + offset)
+                self.backend_hits += 1
+
+    def _store(self, key, value, expires_at, stale_until):
+        self._data[key] = (value, expires_at, stale_until)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def set(self, key, value, ttl=None, stale_ttl=None):
+        """Stores value for ttl seconds, then stale_ttl more as stale (both default to the cache's)."""
+        ttl = self.ttl if ttl is None else ttl
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            self._store(key, value, expires_at, expires_at + stale_ttl)
+        if self.backend is not None:
+            expires_wall = time.time() + ttl
+            try:
+                self.backend.set(self.namespace, key, value, expires_wall, expires_wall + stale_ttl)
+            except Exception as e:
+                print(f"Cache backend write failed for {self.namespace}/{key}: {e}")
+
+    def ttl_remaining(self, key):
+        """Seconds until key stops being fresh (negative once stale), or None if absent.
+
+        With a backend the shared entry counts too, so a refresh written by another
+        process is seen here before this one's copy runs out.
+        """
+        if self.backend is not None:
+            self._load_from_backend(key, force=True)
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None:
+            return None
+        return entry[1] - time.monotonic()
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+        if self.backend is not None:
+            try:
+                self.backend.delete(self.namespace, key)
+            except Exception as e:
+                print(f"Cache backend delete failed for {self.namespace}/{key}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+        if self.backend is not None:
+            try:
+                self.backend.clear(self.namespace)
+            except Exception as e:
+                print(f"Cache backend clear failed for {self.namespace}: {e}")
+
+    def get_or_load(self, key, loader, ttl=None, timeout=None):
+        """Returns the cached value for key, calling loader() on a miss.
+
+        Stale hits are returned immediately and refreshed in a background thread.
+        Concurrent misses for the same key share a single loader() call, and
+        exceptions raised by it propagate to every waiting caller. timeout bounds
+        how long a caller waits on a call another caller started; past it,
+        concurrent.futures.TimeoutError is raised.
+        """
+        value, state = self.get(key)
+        if state == 'fresh':
+            return value
+        if state == 'stale':
+            self.refresh_async(key, loader, ttl)
+            return value
+        return self._flight.do(key, self._load, key, loader, ttl, timeout=timeout)
+
+    def reload(self, key, loader, ttl=None, timeout=None):
+        """Calls loader() unconditionally and stores the result, sharing the call with concurrent misses.
+
+        timeout is as for get_or_load().
+        """
+        def _reload():
+            value = loader()
+            self.set(key, value, ttl)
+            return value
+        return self._flight.do(key, _reload, timeout=timeout)
+
+    def _load(self, key, loader, ttl):
+        # Another caller may have filled the entry while we were queuing for the flight
+        value, state = self.get(key, count=False)
+        if state == 'fresh':
+            return value
+        value = loader()
+        self.set(key, value, ttl)
+        return value
+
+    def refresh_async(self, key, loader, ttl=None):
+        """Reloads key in the background unless a refresh is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def _refresh():
+            try:
+                self.set(key, loader(), ttl)
+            except Exception as e:
+                print(f"Background cache refresh failed for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=_refresh, daemon=True).start()
@@ -0,0 +1,82 @@
+import io
+import base64
+import threading
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg') # Ensure Matplotlib runs in a headless environment
+import matplotlib.pyplot as plt
+
+# pyplot keeps global state, so only one thread per process may render at a time
+_render_lock = threading.Lock()
+
+def parse_days(days_str):
+    """Maps the dropdown value ("1", "7", "30", "90", "365", "max") to (title key, API value)."""
+    try:
+        # Convert days_str from HTML dropdown value to integer for dictionary keys and API
+        if days_str == 'max':
+            return 'max', 'max'
+        days_key_for_title = int(days_str)
+        return days_key_for_title, str(days_key_for_title)
+    except ValueError:
+        return 7, "7" # Default if conversion fails
+
+def render_chart_png(prices_data, coin_name, days_str, overall_trend_color="#39FF14"):
+    """Renders [timestamp_ms, price] pairs to a base64 encoded PNG.
+
+    Kept free of Flask/app state so it can run inside a worker process.
+    """
+    days_key_for_title, days_for_api = parse_days(days_str)
+    with _render_lock:
+        df = pd.DataFrame(prices_data, columns=['timestamp', 'price'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+
+        plt.style.use('dark_background')
+        fig, ax = plt.subplots(figsize=(7, 3), dpi=130)
+    
+        ax.plot(df['timestamp'], df['price'], color=overall_trend_color, linewidth=1.8)
+        ax.set_facecolor('#191f1d')
+
+        num_ticks = 5 
+        if len(df) > num_ticks:
+            ticks_idx = [int(i) for i in np.linspace(0, len(df) - 1, num_ticks)]
+            ax.set_xticks(df['timestamp'].iloc[ticks_idx])
+            date_format = '%d-%b' 
+        
+            if days_key_for_title == 1: 
+                date_format = '%H:%M'
+            elif isinstance(days_key_for_title, int) and days_key_for_title <= 7: 
+                date_format = '%d %b' 
+            elif days_key_for_title == 'max' or (isinstance(days_key_for_title, int) and days_key_for_title > 90): 
+                 date_format = '%b-%y' 
+        
+            ax.set_xticklabels([d.strftime(date_format) for d in df['timestamp'].iloc[ticks_idx]], rotation=0, ha='center')
+    
+        # Synchronized chart_titles with HTML dropdown labels
+        chart_titles_map = {
+            1: "24h",    # Corresponds to value "1" in HTML
+            7: "7d",     # Corresponds to value "7"
+            30: "1m",    # Corresponds to value "30"
+            90: "3m",    # Corresponds to value "90"
+            365: "1y",   # Corresponds to value "365"
+            "max": "Max" # Corresponds to value "max"
+        }
+        chart_title_display = chart_titles_map.get(days_key_for_title, f"{days_for_api} Days") # Fallback if key not found
+    
+        ax.set_title(f"{coin_name} • {chart_title_display}", color=overall_trend_color, fontsize=12, pad=10)
+
+        ax.tick_params(axis='x', colors='#a7ffce', labelsize=8)
+        ax.tick_params(axis='y', colors='#a7ffce', labelsize=9)
+        for spine_pos in ['top', 'right']: 
+            ax.spines[spine_pos].set_visible(False)
+        for spine_pos in ['bottom', 'left']:
+            ax.spines[spine_pos].set_color(overall_trend_color)
+            ax.spines[spine_pos].set_linewidth(1.2)
+
+        plt.tight_layout(pad=0.5) 
+        img_io = io.BytesIO()
+        plt.savefig(img_io, format='png', bbox_inches='tight', transparent=True)
+        img_io.seek(0)
+        img_base64 = base64.b64encode(img_io.getvalue()).decode()
+        plt.close(fig)
+    return img_base64
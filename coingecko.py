@@ -0,0 +1,276 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+COINGECKO_BASE_URL = "https://api.coingecko.com/api/v3"
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CoinGeckoRateLimited(requests.exceptions.RequestException):
+    """Raised when the client-side rate budget has no token available in time."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at rate_per_minute, holding at most burst tokens."""
+
+    def __init__(self, rate_per_minute, burst=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, rate_per_minute // 6))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self):
+        """Tokens that could be taken right now, without taking any."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return 0.0
+            self._refill(now)
+            return self.tokens
+
+    def try_acquire(self):
+        """Takes a token if one is available right now. Returns (acquired, seconds_to_wait)."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return False, self.blocked_until - now
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True, 0.0
+            return False, (1 - self.tokens) / self.rate
+
+    def acquire(self, timeout=None):
+        """Blocks until a token is available. Returns False if that takes longer than timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            acquired, wait = self.try_acquire()
+            if acquired:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def block_for(self, seconds):
+        """Stops handing out tokens for the given number of seconds (e.g. after a 429)."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """TokenBucket kept in a SQLite table, so every process using the database draws from one budget.
+
+    Use it when several workers share a host (and so an upstream quota). State uses
+    wall-clock times since it outlives and crosses processes. If the database
+    can't be used, the in-process TokenBucket state is used instead.
+    """
+
+    def __init__(self, path, rate_per_minute, burst=None, name='coingecko', busy_timeout=5.0):
+        super().__init__(rate_per_minute, burst)
+        self.path = path
+        self.name = name
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._open()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits ("
+                " name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, blocked_until REAL NOT NULL)"
+            )
+        finally:
+            conn.close()
+
+    def _open(self):
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _connect(self):
+        # One connection per thread and process, as in SQLiteCacheBackend
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            self._local.conn = self._open()
+            self._local.pid = pid
+        return self._local.conn
+
+    def _update(self, step):
+        """Applies step to the refilled shared state in one write transaction; returns its result.
+
+        step(tokens, blocked_until, now) returns (result, tokens, blocked_until).
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            conn.execute("INSERT OR IGNORE INTO rate_limits VALUES (?, ?, ?, 0)", (self.name, self.capacity, now))
+            tokens, updated, blocked_until = conn.execute(
+                "SELECT tokens, updated, blocked_until FROM rate_limits WHERE name = ?", (self.name,)
+            ).fetchone()
+            if now >= blocked_until:
+                tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+                updated = now
+            result, tokens, blocked_until = step(tokens, blocked_until, now)
+            conn.execute("UPDATE rate_limits SET tokens = ?, updated = ?, blocked_until = ? WHERE name = ?",
+                         (tokens, updated, blocked_until, self.name))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def available(self):
+        try:
+            row = self._connect().execute(
+                "SELECT tokens, updated, blocked_until FROM rate_limits WHERE name = ?", (self.name,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Shared rate budget unavailable, using the local one: {e}")
+            return super().available()
+        if row is None:
+            return self.capacity
+        tokens, updated, blocked_until = row
+        now = time.time()
+        if now < blocked_until:
+            return 0.0
+        return min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+
+    def try_acquire(self):
+        def take(tokens, blocked_until, now):
+            if now < blocked_until:
+                return (False, blocked_until - now), tokens, blocked_until
+            if tokens >= 1:
+                return (True, 0.0), tokens - 1, blocked_until
+            return (False, (1 - tokens) / self.rate), tokens, blocked_until
+        try:
+            return self._update(take)
+        except sqlite3.Error as e:
+            print(f"Shared rate budget unavailable, using the local one: {e}")
+            return super().try_acquire()
+
+    def block_for(self, seconds):
+        def block(tokens, blocked_until, now):
+            return None, 0.0, max(blocked_until, now + seconds)
+        try:
+            self._update(block)
+        except sqlite3.Error as e:
+            print(f"Shared rate budget unavailable, using the local one: {e}")
+            super().block_for(seconds)
+
+
+def parse_retry_after(value):
+    """Returns the Retry-After header value in seconds, or None if absent/invalid."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CoinGeckoClient:
+    """Shared CoinGecko HTTP client.
+
+    Keeps a pooled keep-alive Session, spends one token-bucket token per upstream
+    call (from bucket if given, e.g. a SQLiteTokenBucket shared by several workers), and retries 429/5xx/connection errors with jittered exponential backoff,
+    honouring Retry-After. observer(status), if given, is called after every
+    attempt with the HTTP status code, or 'error' for connection failures.
+    """
+
+    def __init__(self, base_url=COINGECKO_BASE_URL, api_key=None, rate_per_minute=30, burst=None,
+                 max_retries=3, backoff_base=0.5, backoff_max=8.0, max_retry_wait=10.0,
+                 rate_limit_wait=5.0, pool_size=20, observer=None, bucket=None):
+        self.base_url = base_url.rstrip('/')
+        self.observer = observer
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_wait = max_retry_wait
+        self.rate_limit_wait = rate_limit_wait
+        self.bucket = bucket if bucket is not None else TokenBucket(rate_per_minute, burst)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Accept': 'application/json'})
+        if api_key:
+            self.session.headers.update({'x-cg-demo-api-key': api_key})
+
+    def _observe(self, status):
+        if self.observer is not None:
+            self.observer(status)
+
+    def _backoff(self, attempt):
+        # Full jitter: uniform between 0 and the capped exponential delay
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _fits(deadline, seconds):
+        """True if sleeping for seconds still leaves time before deadline."""
+        return deadline is None or time.monotonic() + seconds < deadline
+
+    def get(self, path, params=None, timeout=15, deadline=None):
+        """GETs base_url + path and returns the decoded JSON body.
+
+        deadline (a time.monotonic() value) bounds the whole call, including rate
+        limit waits and retries; once it has passed requests.exceptions.Timeout is raised.
+        Raises requests.exceptions.HTTPError (with .response) for non-retryable or
+        exhausted HTTP errors, CoinGeckoRateLimited when the local budget is spent,
+        and other requests exceptions for connection failures.
+        """
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        attempt = 0
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise requests.exceptions.Timeout(f"Request deadline exceeded before CoinGecko call to {path}")
+            rate_wait = self.rate_limit_wait if remaining is None else min(self.rate_limit_wait, remaining)
+            if not self.bucket.acquire(timeout=rate_wait):
+                raise CoinGeckoRateLimited(f"CoinGecko rate budget exhausted for {path}")
+            attempt_timeout = timeout if deadline is None else max(0.001, min(timeout, deadline - time.monotonic()))
+            try:
+                resp = self.session.get(url, params=params, timeout=attempt_timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self._observe('error')
+                backoff = self._backoff(attempt)
+                if attempt >= self.max_retries or not self._fits(deadline, backoff):
+                    raise
+                time.sleep(backoff)
+                attempt += 1
+                continue
+
+            self._observe(resp.status_code)
+            if resp.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                retry_after = parse_retry_after(resp.headers.get('Retry-After'))
+                if resp.status_code == 429:
+                    # Stop every thread from spending quota until the server is ready again
+                    self.bucket.block_for(retry_after if retry_after is not None else self._backoff(attempt + 1))
+                wait = retry_after if retry_after is not None else self._backoff(attempt)
+                if wait <= self.max_retry_wait and self._fits(deadline, wait):
+                    time.sleep(wait)
+                    attempt += 1
+                    continue
+
+            resp.raise_for_status()
+            return resp.json()
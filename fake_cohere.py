@@ -0,0 +1,48 @@
+import time
+from types import SimpleNamespace
+
+DEFAULT_FAKE_SUMMARY = (
+    "1. Latest News & Developments: No live news is available in offline mode.\n"
+    "2. Key Facts: This is a locally generated placeholder analysis.\n"
+    "This information should not be considered financial advice."
+)
+
+
+class FakeCohereClient:
+    """Offline stand-in for cohere.Client used in tests and benchmarks.
+
+    Mimics the parts of the Cohere API the dashboard uses: chat() returns an
+    object with a .text attribute and chat_stream() yields 'text-generation'
+    events followed by a 'stream-end' event.
+    """
+
+    def __init__(self, text=DEFAULT_FAKE_SUMMARY, first_token_latency=0.0, token_latency=0.0):
+        self.text = text
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.calls = 0
+
+    def _tokens(self):
+        # Keep whitespace attached so joined chunks reproduce the text exactly
+        token = ""
+        for ch in self.text:
+            token += ch
+            if ch.isspace():
+                yield token
+                token = ""
+        if token:
+            yield token
+
+    def chat(self, message=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.first_token_latency + self.token_latency * len(self.text.split()))
+        return SimpleNamespace(text=self.text)
+
+    def chat_stream(self, message=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.first_token_latency)
+        for token in self._tokens():
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            yield SimpleNamespace(event_type="text-generation", text=token)
+        yield SimpleNamespace(event_type="stream-end", finish_reason="COMPLETE")
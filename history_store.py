@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from singleflight import SingleFlight
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+DAY_MS = 86400000
+
+# Column name -> (dtype, key in the market_chart payload)
+COLUMNS = {
+    'timestamps': (np.dtype('<i8'), None),
+    'prices': (np.dtype('<f8'), 'prices'),
+    'market_caps': (np.dtype('<f8'), 'market_caps'),
+    'total_volumes': (np.dtype('<f8'), 'total_volumes'),
+}
+
+
+class PriceHistoryStore:
+    """Append-only, memory-mapped daily price history per coin.
+
+    Each coin gets one raw little-endian file per column under root_dir/<coin_id>/.
+    Only completed UTC days are written, so files only ever grow and existing
+    memory maps stay valid; the current day's provisional point is kept in memory.
+    The first update downloads the full daily history, later ones only the tail.
+
+    fetch(coin_id, days) must return a CoinGecko market_chart payload at daily interval.
+    """
+
+    def __init__(self, root_dir, fetch, refresh_interval=300):
+        self.root_dir = root_dir
+        self.fetch = fetch
+        self.refresh_interval = refresh_interval
+        self._latest = {}  # coin_id -> provisional point (dict of column -> value)
+        self._refreshed_at = {}
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    def _coin_dir(self, coin_id):
+        safe_id = "".join(ch for ch in coin_id if ch.isalnum() or ch in "-_.")
+        return os.path.join(self.root_dir, safe_id)
+
+    def _path(self, coin_id, column):
+        dtype = COLUMNS[column][0]
+        return os.path.join(self._coin_dir(coin_id), f"{column}.{dtype.kind}{dtype.itemsize}")
+
+    def _length(self, coin_id):
+        # Columns are appended one after another; a crash mid-append leaves the
+        # timestamps (written last) as the shortest, so the min is always consistent.
+        lengths = []
+        for column, (dtype, _) in COLUMNS.items():
+            try:
+                lengths.append(os.path.getsize(self._path(coin_id, column)) // dtype.itemsize)
+            except OSError:
+                return 0
+        return min(lengths)
+
+    def read(self, coin_id, since_ms=None):
+        """Returns {column: array} views over the stored history, without copying.
+
+        since_ms limits the result to points at or after that timestamp.
+        """
+        n = self._length(coin_id)
+        if n == 0:
+            return {column: np.empty(0, dtype=dtype) for column, (dtype, _) in COLUMNS.items()}
+        arrays = {
+            column: np.memmap(self._path(coin_id, column), dtype=dtype, mode='r', shape=(n,))
+            for column, (dtype, _) in COLUMNS.items()
+        }
+        start = 0 if since_ms is None else int(np.searchsorted(arrays['timestamps'], since_ms))
+        return {column: arr[start:] for column, arr in arrays.items()}
+
+    def latest(self, coin_id):
+        """Returns the in-memory provisional point for today, or None."""
+        return self._latest.get(coin_id)
+
+    def series(self, coin_id, since_ms=None):
+        """Returns (stored, provisional): read() views plus today's point if it is newer, else None.
+
+        Nothing is copied; callers that need one contiguous array append the
+        provisional point themselves, and only for the columns they use.
+        """
+        stored = self.read(coin_id, since_ms)
+        latest = self.latest(coin_id)
+        if latest is None or (len(stored['timestamps']) and latest['timestamps'] <= stored['timestamps'][-1]):
+            return stored, None
+        return stored, latest
+
+    def update(self, coin_id, timeout=None):
+        """Brings the coin's history up to date; concurrent calls share one refresh.
+
+        timeout bounds how long a caller waits on a refresh another caller started
+        (concurrent.futures.TimeoutError).
+        """
+        refreshed_at = self._refreshed_at.get(coin_id)
+        if refreshed_at is not None and time.monotonic() - refreshed_at < self.refresh_interval:
+            return
+        self._flight.do(coin_id, self._update, coin_id, timeout=timeout)
+
+    def _update(self, coin_id):
+        n = self._length(coin_id)
+        if n == 0:
+            days = 'max'
+        else:
+            last_ts = int(self.read(coin_id)['timestamps'][-1])
+            days = str(int((time.time() * 1000 - last_ts) // DAY_MS) + 2)
+
+        payload = self.fetch(coin_id, days)
+        columns = self._columns_from_payload(payload)
+        today_start = int(time.time() * 1000) // DAY_MS * DAY_MS
+
+        self._append(coin_id, columns, today_start)
+        if len(columns['timestamps']):
+            last = len(columns['timestamps']) - 1
+            self._latest[coin_id] = {column: arr[last] for column, arr in columns.items()}
+        self._refreshed_at[coin_id] = time.monotonic()
+
+    def _columns_from_payload(self, payload):
+        prices = np.asarray(payload.get('prices') or [], dtype=np.float64).reshape(-1, 2)
+        columns = {'timestamps': prices[:, 0].astype(np.int64), 'prices': prices[:, 1]}
+        for column in ('market_caps', 'total_volumes'):
+            values = np.asarray(payload.get(COLUMNS[column][1]) or [], dtype=np.float64).reshape(-1, 2)
+            if len(values) == len(prices):
+                columns[column] = values[:, 1]
+            else:
+                columns[column] = np.full(len(prices), np.nan)
+        return columns
+
+    def _append(self, coin_id, columns, before_ms):
+        os.makedirs(self._coin_dir(coin_id), exist_ok=True)
+        lock_path = os.path.join(self._coin_dir(coin_id), '.lock')
+        with self._lock, open(lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Drop rows left over from an interrupted append so columns stay aligned
+                n = self._length(coin_id)
+                for column, (dtype, _) in COLUMNS.items():
+                    path = self._path(coin_id, column)
+                    if os.path.exists(path) and os.path.getsize(path) > n * dtype.itemsize:
+                        os.truncate(path, n * dtype.itemsize)
+
+                # Re-read under the lock: another process may have appended meanwhile
+                stored_ts = self.read(coin_id)['timestamps']
+                last_ts = int(stored_ts[-1]) if len(stored_ts) else -1
+                ts = columns['timestamps']
+                mask = (ts > last_ts) & (ts < before_ms)
+                if not mask.any():
+                    return
+                # Timestamps last, so a partial write never exposes unmatched rows
+                for column in ('prices', 'market_caps', 'total_volumes', 'timestamps'):
+                    dtype = COLUMNS[column][0]
+                    with open(self._path(coin_id, column), 'ab') as f:
+                        f.write(np.ascontiguousarray(columns[column][mask], dtype=dtype).tobytes())
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
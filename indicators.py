@@ -0,0 +1,142 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+YEAR_MS = 365 * 86400000
+
+# Smallest decay factor allowed inside one closed-form EMA block; keeps the
+# rescaled terms far from float64 under/overflow
+_EMA_MIN_SCALE = 1e-200
+
+
+def _nan_prefix(values, n, count):
+    out = np.full(n, np.nan)
+    out[count:] = values
+    return out
+
+
+def sma(x, window):
+    """Simple moving average; the first window - 1 points are NaN."""
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    if window < 1 or window > n:
+        return np.full(n, np.nan)
+    return _nan_prefix(sliding_window_view(x, window).mean(axis=1), n, window - 1)
+
+
+def rolling_std(x, window, ddof=0):
+    """Moving standard deviation; the first window - 1 points are NaN."""
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    if window < 1 + ddof or window > n:
+        return np.full(n, np.nan)
+    return _nan_prefix(sliding_window_view(x, window).std(axis=1, ddof=ddof), n, window - 1)
+
+
+def ewm(x, alpha, initial=None):
+    """Exponentially weighted mean y[t] = alpha * x[t] + (1 - alpha) * y[t - 1].
+
+    Computed in closed form with cumulative sums, block by block so the decay
+    factors never underflow; the Python loop runs once per block, not per point.
+    initial seeds y[-1] (defaults to x[0], i.e. y[0] = x[0]).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    out = np.empty(n)
+    if n == 0:
+        return out
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        out[:] = x
+        return out
+    block = n if decay == 1.0 else max(1, min(n, int(np.log(_EMA_MIN_SCALE) / np.log(decay))))
+    prev = x[0] if initial is None else float(initial)
+    for start in range(0, n, block):
+        chunk = x[start:start + block]
+        powers = decay ** np.arange(1, len(chunk) + 1)
+        # y[k] = decay^(k+1) * (prev + sum_{j<=k} alpha * x[j] / decay^(j+1))
+        out[start:start + len(chunk)] = powers * (prev + np.cumsum(alpha * chunk / powers))
+        prev = out[start + len(chunk) - 1]
+    return out
+
+
+def ema(x, span):
+    """Exponential moving average with alpha = 2 / (span + 1), seeded with the first value."""
+    return ewm(x, 2.0 / (span + 1.0))
+
+
+def rsi(prices, period=14):
+    """Wilder's relative strength index (0-100); the first period points are NaN."""
+    prices = np.asarray(prices, dtype=np.float64)
+    n = len(prices)
+    out = np.full(n, np.nan)
+    if period < 1 or n <= period:
+        return out
+    delta = np.diff(prices)
+    gains = np.clip(delta, 0, None)
+    losses = np.clip(-delta, 0, None)
+    # Seed with the simple average of the first period moves, then Wilder smoothing
+    alpha = 1.0 / period
+    avg_gain = ewm(gains[period:], alpha, initial=gains[:period].mean())
+    avg_loss = ewm(losses[period:], alpha, initial=losses[:period].mean())
+    avg_gain = np.concatenate(([gains[:period].mean()], avg_gain))
+    avg_loss = np.concatenate(([losses[:period].mean()], avg_loss))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        values = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), 100.0 - 100.0 / (1.0 + rs))
+    out[period:] = values
+    return out
+
+
+def bollinger(prices, window=20, k=2.0):
+    """Returns (middle, upper, lower) Bollinger bands around a window-point SMA."""
+    middle = sma(prices, window)
+    width = k * rolling_std(prices, window)
+    return middle, middle + width, middle - width
+
+
+def log_returns(prices):
+    """Per-period log returns; the first point is NaN."""
+    prices = np.asarray(prices, dtype=np.float64)
+    out = np.full(len(prices), np.nan)
+    if len(prices) > 1:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out[1:] = np.diff(np.log(prices))
+    return out
+
+
+def periods_per_year(timestamps_ms):
+    """Sampling frequency implied by the median spacing of the timestamps."""
+    if len(timestamps_ms) < 2:
+        return None
+    step = float(np.median(np.diff(np.asarray(timestamps_ms, dtype=np.float64))))
+    return YEAR_MS / step if step > 0 else None
+
+
+def realized_volatility(prices, timestamps_ms, window=30):
+    """Returns (rolling annualized volatility series, annualized volatility over the whole range)."""
+    returns = log_returns(prices)
+    per_year = periods_per_year(timestamps_ms)
+    if per_year is None:
+        return np.full(len(returns), np.nan), None
+    scale = np.sqrt(per_year)
+    rolling = np.full(len(returns), np.nan)
+    if len(returns) > 1:
+        rolling[1:] = rolling_std(returns[1:], window, ddof=1) * scale
+    finite = returns[np.isfinite(returns)]
+    overall = float(finite.std(ddof=1) * scale) if len(finite) > 1 else None
+    return rolling, overall
+
+
+def drawdown(prices):
+    """Returns (drawdown series as fractions <= 0, max drawdown, peak index, trough index)."""
+    prices = np.asarray(prices, dtype=np.float64)
+    if len(prices) == 0:
+        return prices, None, None, None
+    running_max = np.maximum.accumulate(prices)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        series = prices / running_max - 1.0
+    if np.isnan(series).all():
+        return series, None, None, None
+    trough = int(np.nanargmin(series))
+    peak = int(np.argmax(prices[:trough + 1]))
+    return series, float(series[trough]), peak, trough
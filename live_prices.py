@@ -0,0 +1,161 @@
+import threading
+import time
+
+
+class LivePricesFull(Exception):
+    """Raised when subscribing would start a poller beyond max_coins."""
+
+
+class Subscription:
+    """One client's feed for a coin.
+
+    Changes are merged into a single pending dict instead of queued, so a slow
+    reader only ever holds the latest value of each field.
+    """
+
+    def __init__(self, hub, coin_id):
+        self.hub = hub
+        self.coin_id = coin_id
+        self.closed = False
+        self._pending = {}
+        self._cond = threading.Condition()
+
+    def push(self, changes):
+        with self._cond:
+            self._pending.update(changes)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Waits for changes and returns them merged; {} on timeout or once closed."""
+        with self._cond:
+            if not self._pending and not self.closed:
+                self._cond.wait(timeout)
+            changes, self._pending = self._pending, {}
+            return changes
+
+    def close(self):
+        """Unsubscribes; safe to call more than once."""
+        if not self.closed:
+            self.closed = True
+            self.hub.unsubscribe(self)
+            with self._cond:
+                self._cond.notify()
+
+
+class _Watch:
+    def __init__(self, coin_id):
+        self.coin_id = coin_id
+        self.subscribers = set()
+        self.snapshot = {}
+        self.idle_since = None
+
+
+class LivePriceHub:
+    """Fans live price updates out to subscribers from a single polling thread.
+
+    fetch(coin_ids) returns {coin_id: flat dict of fields} for every watched coin
+    at once; coins missing from the result are reported as not found. After each
+    poll only the fields that changed are pushed to a coin's subscribers; a new
+    subscriber first receives the full current snapshot, and a newly watched coin
+    triggers an early poll (at most one per quarter interval). A coin is dropped
+    once it has had no subscribers for idle_timeout seconds, and the thread exits
+    when nothing is watched, so upstream calls follow the interval, not the number
+    of coins or clients.
+    has_budget() is checked before every poll; when it is False the poll is skipped.
+    """
+
+    def __init__(self, fetch, interval=15, idle_timeout=30, max_coins=100, has_budget=None):
+        self.fetch = fetch
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.max_coins = max_coins
+        self.has_budget = has_budget or (lambda: True)
+        self._watches = {}
+        self._thread = None
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def subscribe(self, coin_id):
+        """Returns a Subscription for coin_id, starting the poller if needed."""
+        with self._lock:
+            watch = self._watches.get(coin_id)
+            if watch is None:
+                if len(self._watches) >= self.max_coins:
+                    raise LivePricesFull(f"Live prices are limited to {self.max_coins} coins at a time")
+                watch = self._watches[coin_id] = _Watch(coin_id)
+                self._wake.set()
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='live-prices', daemon=True)
+                    self._thread.start()
+            subscription = Subscription(self, coin_id)
+            watch.subscribers.add(subscription)
+            watch.idle_since = None
+            # Under the lock, so a concurrent delta can't be overwritten by an older snapshot
+            if watch.snapshot:
+                subscription.push(watch.snapshot)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            watch = self._watches.get(subscription.coin_id)
+            if watch is None:
+                return
+            watch.subscribers.discard(subscription)
+            if not watch.subscribers:
+                watch.idle_since = time.monotonic()
+
+    def stats(self):
+        """Returns {coin_id: subscriber count} for every watched coin."""
+        with self._lock:
+            return {coin_id: len(watch.subscribers) for coin_id, watch in self._watches.items()}
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def _publish(self, watch, fields):
+        changes = {k: v for k, v in fields.items() if watch.snapshot.get(k, object()) != v}
+        if not changes:
+            return
+        watch.snapshot.update(changes)
+        for subscription in watch.subscribers:
+            subscription.push(changes)
+
+    def _watched(self):
+        """Drops coins unwatched for idle_timeout and returns the remaining ids.
+
+        When none remain the poller is marked as gone (under the lock, so a
+        concurrent subscribe starts a new one) and an empty list is returned.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for coin_id, watch in list(self._watches.items()):
+                if not watch.subscribers and watch.idle_since is not None and now - watch.idle_since >= self.idle_timeout:
+                    del self._watches[coin_id]
+            if not self._watches or self._stopped.is_set():
+                self._thread = None
+                return []
+            return list(self._watches)
+
+    def _run(self):
+        while True:
+            coin_ids = self._watched()
+            if not coin_ids:
+                return
+            self._wake.clear()
+            if self.has_budget():
+                try:
+                    results = self.fetch(coin_ids)
+                except Exception as e:
+                    print(f"Live price poll failed for {len(coin_ids)} coins: {e}")
+                else:
+                    with self._lock:
+                        for coin_id in coin_ids:
+                            watch = self._watches.get(coin_id)
+                            if watch is not None:
+                                self._publish(watch, results.get(coin_id) or {'error': 'not_found'})
+            polled_at = time.monotonic()
+            if self._wake.wait(self.interval):
+                # Early polls for new coins still keep a quarter interval apart
+                self._stopped.wait(max(0.0, polled_at + self.interval / 4 - time.monotonic()))
@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import defaultdict
+
+
+class PrefetchScheduler:
+    """Background thread that keeps the most requested coins warm.
+
+    record() is called for every user request; counts decay each cycle, so the hot
+    set follows current traffic. Every interval seconds each task(coin_id) runs for
+    the top_n coins (plus seed_ids). Tasks decide themselves whether their entry is
+    due for a refresh. has_budget() is checked before every task so prefetching
+    never spends the upstream quota that user requests need.
+    """
+
+    def __init__(self, tasks, top_n=10, interval=15, decay=0.9, seed_ids=(), has_budget=None):
+        self.tasks = list(tasks)
+        self.top_n = top_n
+        self.interval = interval
+        self.decay = decay
+        self.seed_ids = tuple(seed_ids)
+        self.has_budget = has_budget or (lambda: True)
+        self._counts = defaultdict(float)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, coin_id):
+        with self._lock:
+            self._counts[coin_id] += 1.0
+
+    def hot_set(self):
+        """Seed ids followed by the top_n most requested coins, without duplicates."""
+        with self._lock:
+            ranked = sorted(self._counts, key=self._counts.get, reverse=True)[:self.top_n]
+        return list(dict.fromkeys(self.seed_ids + tuple(ranked)))
+
+    def _decay(self):
+        with self._lock:
+            for coin_id in list(self._counts):
+                self._counts[coin_id] *= self.decay
+                if self._counts[coin_id] < 0.05:
+                    del self._counts[coin_id]
+
+    def run_once(self):
+        """Runs one refresh cycle. Returns the number of tasks that were run."""
+        ran = 0
+        try:
+            for coin_id in self.hot_set():
+                for task in self.tasks:
+                    if self._stop.is_set() or not self.has_budget():
+                        return ran
+                    try:
+                        task(coin_id)
+                        ran += 1
+                    except Exception as e:
+                        print(f"Prefetch task {getattr(task, '__name__', task)} failed for {coin_id}: {e}")
+            return ran
+        finally:
+            self._decay()
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.run_once()
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='prefetch', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,135 @@
+import contextvars
+import threading
+from concurrent.futures import Future, TimeoutError
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait for and share its result, or re-raise its exception. A waiter
+    that gives up (timeout) only stops waiting; the shared call keeps running for
+    everyone else.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def running(self, key):
+        """True while a call for key is in flight."""
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key, fn, *args, timeout=None, **kwargs):
+        """Returns fn(*args, **kwargs), shared with concurrent callers using the same key.
+
+        Raises concurrent.futures.TimeoutError if a waiting caller's timeout expires.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                future.set_running_or_notify_cancel()  # waiters must not be able to cancel it
+                self._calls[key] = future
+
+        if not leader:
+            return future.result(timeout=timeout)
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+class _Broadcast:
+    """Chunks of one shared stream, kept so late subscribers can replay them."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def follow(self, timeout=None):
+        """Yields every chunk from the first one, waiting for new ones until the stream ends.
+
+        Re-raises the stream's exception at the point it occurred. Raises
+        concurrent.futures.TimeoutError if no chunk arrives for timeout seconds.
+        """
+        i = 0
+        while True:
+            with self.cond:
+                if i >= len(self.chunks) and not self.done:
+                    if not self.cond.wait_for(lambda: i < len(self.chunks) or self.done, timeout):
+                        raise TimeoutError(f"Shared stream produced nothing for {timeout} s")
+                new = self.chunks[i:]
+                done, error = self.done, self.error
+            for chunk in new:
+                yield chunk
+            i += len(new)
+            if done and i >= len(self.chunks):
+                if error is not None:
+                    raise error
+                return
+
+
+class StreamFlight:
+    """Coalesces concurrent streams with the same key into one upstream stream.
+
+    The first caller for a key starts iterating fn(*args, **kwargs) on a background
+    thread (carrying the caller's context); every caller, the first included, gets a
+    generator that replays the chunks produced so far and then follows live. The
+    stream runs to completion even if all subscribers disconnect, so whatever it
+    stores at the end (e.g. a cache entry) is still written.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def running(self, key):
+        """True while a stream for key is in flight."""
+        with self._lock:
+            return key in self._calls
+
+    def stream(self, key, fn, *args, timeout=None, **kwargs):
+        """Returns a generator over the shared stream for key, starting it if needed.
+
+        timeout bounds the wait for each next chunk (concurrent.futures.TimeoutError).
+        """
+        with self._lock:
+            broadcast = self._calls.get(key)
+            if broadcast is None:
+                broadcast = self._calls[key] = _Broadcast()
+                ctx = contextvars.copy_context()
+                threading.Thread(target=ctx.run, args=(self._run, key, broadcast, fn, args, kwargs),
+                                 daemon=True).start()
+        return broadcast.follow(timeout)
+
+    def _run(self, key, broadcast, fn, args, kwargs):
+        try:
+            for chunk in fn(*args, **kwargs):
+                with broadcast.cond:
+                    broadcast.chunks.append(chunk)
+                    broadcast.cond.notify_all()
+        except BaseException as e:
+            broadcast.error = e
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            with broadcast.cond:
+                broadcast.done = True
+                broadcast.cond.notify_all()
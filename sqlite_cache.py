@@ -0,0 +1,149 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+# Values at least this large are zlib-compressed before they are stored
+COMPRESS_THRESHOLD = 1024
+
+
+class CacheBackend:
+    """Shared second-level store behind TTLCache.
+
+    Entries are addressed by (namespace, key) and carry wall-clock expiry times,
+    since they outlive the process that wrote them.
+    """
+
+    def get(self, namespace, key):
+        """Returns (value, expires_at, stale_until) or None; entries past stale_until are never returned."""
+        raise NotImplementedError
+
+    def set(self, namespace, key, value, expires_at, stale_until):
+        raise NotImplementedError
+
+    def delete(self, namespace, key):
+        raise NotImplementedError
+
+    def clear(self, namespace):
+        raise NotImplementedError
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """CacheBackend in a SQLite database in WAL mode, shared by every process on the host.
+
+    Values are pickled and, when large, zlib-compressed. Expired entries are purged
+    every evict_interval seconds; if the stored values then exceed max_bytes the
+    oldest writes are dropped until they fit again.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, evict_interval=60, busy_timeout=5.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.evict_interval = evict_interval
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._evict_lock = threading.Lock()
+        self._last_evict = 0.0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Schema setup gets its own connection, closed right away: this usually runs at
+        # import time, possibly in a server master that forks its workers afterwards
+        conn = self._open()
+        try:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS cache ("
+                    " namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,"
+                    " compressed INTEGER NOT NULL, size INTEGER NOT NULL, stored_at REAL NOT NULL,"
+                    " expires_at REAL NOT NULL, stale_until REAL NOT NULL,"
+                    " PRIMARY KEY (namespace, key))"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS cache_stale_until ON cache (stale_until)")
+                conn.execute("CREATE INDEX IF NOT EXISTS cache_stored_at ON cache (stored_at)")
+        finally:
+            conn.close()
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _connect(self):
+        # sqlite3 connections must not be shared between threads or carried across a
+        # fork; keep one per thread and process (a forked child inherits the thread-local)
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            self._local.conn = self._open()
+            self._local.pid = pid
+        return self._local.conn
+
+    @staticmethod
+    def _key(key):
+        return repr(key)
+
+    def get(self, namespace, key):
+        row = self._connect().execute(
+            "SELECT value, compressed, expires_at, stale_until FROM cache"
+            " WHERE namespace = ? AND key = ? AND stale_until > ?",
+            (namespace, self._key(key), time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        blob, compressed, expires_at, stale_until = row
+        return pickle.loads(zlib.decompress(blob) if compressed else blob), expires_at, stale_until
+
+    def set(self, namespace, key, value, expires_at, stale_until):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        compressed = len(blob) >= COMPRESS_THRESHOLD
+        if compressed:
+            blob = zlib.compress(blob, 6)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache"
+                " (namespace, key, value, compressed, size, stored_at, expires_at, stale_until)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (namespace, self._key(key), blob, int(compressed), len(blob), time.time(), expires_at, stale_until)
+            )
+        self._maybe_evict()
+
+    def delete(self, namespace, key):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, self._key(key)))
+
+    def clear(self, namespace):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+
+    def _maybe_evict(self):
+        now = time.monotonic()
+        with self._evict_lock:
+            if now - self._last_evict < self.evict_interval:
+                return
+            self._last_evict = now
+        self.evict()
+
+    def evict(self):
+        """Purges expired entries, then the oldest ones while over max_bytes."""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE stale_until <= ?", (time.time(),))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # Keep the newest entries that fit, with 10% headroom so this doesn't run on every write
+            budget = int(self.max_bytes * 0.9)
+            kept, cutoff = 0, None
+            for stored_at, size in conn.execute("SELECT stored_at, size FROM cache ORDER BY stored_at DESC"):
+                kept += size
+                if kept > budget:
+                    cutoff = stored_at
+                    break
+            if cutoff is not None:
+                conn.execute("DELETE FROM cache WHERE stored_at <= ?", (cutoff,))
+